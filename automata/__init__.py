@@ -0,0 +1,11 @@
+# Грамматики и автоматы без графического интерфейса: на них построены лабораторные
+# и интерфейс командной строки (python -m automata run|trace|replay, см. --help)
+from .compiled_grammar import CompiledGrammar
+from .dfa import CompiledDFA, RunResult
+from .dpda import CompiledDPDA, DPDAResult, DPDATrace
+from .earley import parse, parse_forest
+from .npda import NPDA, NPDAResult
+from .grammar import CountLimitExceeded, Grammar, build_parse_tree, count_chains, iter_chains
+from .loader import LoadedMachine, MachineSpec, load_machine
+from .tracefile import TraceReader, TraceWriter, record_run
+from .transducer import Transducer, TranslationResult
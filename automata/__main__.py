@@ -0,0 +1,127 @@
+import argparse
+import json
+import sys
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .compiled_grammar import CompiledGrammar
+from .dpda import format_rule
+from .earley import parse
+from .grammar import Grammar
+from .loader import load_machine
+from .tracefile import SNAPSHOT_INTERVAL, TraceReader, record_run
+
+# Проверка одной цепочки: (принята ли, перевод или None)
+Checker = Callable[[str], Tuple[bool, Optional[str]]]
+
+
+def load_checker(filename: str) -> Checker:
+    # Вид автомата определяется по полям JSON-файла: ДКА (lab2), ДМПА (lab3),
+    # МП-преобразователь (lab4, правила из шести полей) или грамматика (VT, VN, P, S)
+    with open(filename, "r", encoding="utf-8") as json_file:
+        data = json.load(json_file)
+    if "VT" in data:
+        grammar = CompiledGrammar(Grammar(data["VT"], data["VN"], data["P"], data["S"]))
+        return lambda word: (parse(grammar, word)[0] is not None, None)
+    if "Func" not in data and "rules" not in data:
+        raise ValueError(f"Не удалось определить вид автомата в файле {filename}")
+    loaded = load_machine(filename)
+    machine = loaded.compiled
+    if loaded.spec.kind == "dfa":
+        return lambda word: (machine.accepts(word), None)
+    is_transducer = loaded.spec.kind == "transducer"
+    if loaded.nondeterministic:
+        # Недетерминированный автомат: перебор конфигураций
+        def run_npda(word):
+            result = machine.run(word, path=is_transducer)
+            return result.accepted, result.output if result.accepted else None
+        return run_npda
+    if is_transducer:
+        def translate(word):
+            result = machine.translate(word)
+            return result.accepted, result.output if result.accepted else None
+        return translate
+    return lambda word: (machine.run(word).accepted, None)
+
+
+def read_inputs(filenames: List[str]) -> Iterator[str]:
+    # Цепочки по одной на строку из файлов; "-" или пустой список - стандартный ввод
+    for filename in filenames or ["-"]:
+        stream = sys.stdin if filename == "-" else open(filename, "r", encoding="utf-8")
+        try:
+            for line in stream:
+                yield line.rstrip("\r\n")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def run(machine: str, inputs: List[str], out=sys.stdout) -> int:
+    # Для каждой цепочки - строка "цепочка<TAB>accepted|rejected[<TAB>перевод]".
+    # Возвращает число принятых цепочек.
+    check = load_checker(machine)
+    accepted_count = 0
+    write = out.write
+    for word in read_inputs(inputs):
+        accepted, output = check(word)
+        accepted_count += accepted
+        if output is None:
+            write(f"{word}\t{'accepted' if accepted else 'rejected'}\n")
+        else:
+            write(f"{word}\taccepted\t{output}\n")
+    return accepted_count
+
+
+def trace(machine: str, word: str, path: str, interval: int = SNAPSHOT_INTERVAL, out=sys.stdout) -> bool:
+    # Проход ДМПА или МП-преобразователя по цепочке с записью трассы в двоичный файл
+    loaded = load_machine(machine)
+    if loaded.spec.kind == "dfa" or loaded.nondeterministic:
+        raise ValueError(loaded.nondeterministic or "Трасса записывается только для ДМПА и МП-преобразователя")
+    result = record_run(loaded.compiled, word, path, interval)
+    out.write(f"{'accepted' if result.accepted else 'rejected'}\t{result.steps} шагов записано в {path}\n")
+    return result.accepted
+
+
+def replay(path: str, steps: List[int], out=sys.stdout):
+    # Конфигурации перед указанными шагами; без шагов - итог прохода из файла
+    with TraceReader(path) as reader:
+        if not steps:
+            out.write(f"{len(reader)} шагов, итог: {json.dumps(reader.summary, ensure_ascii=False)}\n")
+        for k in steps:
+            state, stack, depth = reader.configuration(k)
+            line = f"{k}\t{state}\t{stack or 'ε'}\t{depth}"
+            if k < len(reader):
+                _, symbol, rule = reader.step(k)
+                line += f"\t{symbol}\t{format_rule(rule) if rule else '-'}"
+            out.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m automata")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="проверить цепочки автоматом или грамматикой из JSON-файла")
+    run_parser.add_argument("machine", help="JSON-файл автомата или грамматики")
+    run_parser.add_argument("inputs", nargs="*", help="файлы с цепочками по одной на строку (- или ничего: stdin)")
+    trace_parser = commands.add_parser("trace", help="записать трассу ДМПА или МП-преобразователя в файл")
+    trace_parser.add_argument("machine", help="JSON-файл автомата")
+    trace_parser.add_argument("word", help="входная цепочка")
+    trace_parser.add_argument("output", help="файл трассы")
+    trace_parser.add_argument("--interval", type=int, default=SNAPSHOT_INTERVAL, help="шагов между снимками стека")
+    replay_parser = commands.add_parser("replay", help="показать конфигурации из файла трассы")
+    replay_parser.add_argument("trace", help="файл трассы")
+    replay_parser.add_argument("steps", nargs="*", type=int, help="номера шагов (с нуля)")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "run":
+            run(args.machine, args.inputs)
+        elif args.command == "trace":
+            trace(args.machine, args.word, args.output, args.interval)
+        else:
+            replay(args.trace, args.steps)
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
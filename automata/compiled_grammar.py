@@ -0,0 +1,267 @@
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+INF = float("inf")
+END = -1  # Маркер конца цепочки в множествах FOLLOW
+EMPTY = ("ε", "λ")  # Обозначения пустой цепочки в правых частях правил
+
+
+def tokenize(text: str, vocabulary) -> List[str]:
+    # Разбивает запись правой части (или цепочки) на символы. Если в записи есть
+    # пробелы, символы разделены ими; иначе берётся самое длинное имя из словаря,
+    # а неизвестный знак считается отдельным символом. ε и λ обозначают пустую цепочку.
+    text = text.strip()
+    if any(c.isspace() for c in text):
+        tokens = text.split()
+    else:
+        lengths = sorted({len(name) for name in vocabulary}, reverse=True)
+        tokens = []
+        i = 0
+        while i < len(text):
+            for length in lengths:
+                if text[i:i + length] in vocabulary:
+                    break
+            else:
+                length = 1
+            tokens.append(text[i:i + length])
+            i += length
+    return [token for token in tokens if token not in EMPTY]
+
+
+class CompiledGrammar:
+    # Грамматика, подготовленная для перебора и разбора: символы заменены номерами,
+    # правила сгруппированы по левой части, свойства символов посчитаны один раз.
+    # Нетерминалы имеют номера 0..nonterminal_count-1, терминалы - следующие номера
+    # в порядке возрастания имён, поэтому сравнение номеров терминалов совпадает
+    # с лексикографическим сравнением. Символы правых частей, не объявленные в VT и VN,
+    # считаются нетерминалами без правил (непродуктивными).
+    def __init__(self, grammar):
+        vocabulary = set(grammar.VT) | set(grammar.VN)
+        declared = set(grammar.VN)
+        rules = [(left, tokenize(option, vocabulary))
+                 for left, options in grammar.P.items() if left in declared
+                 for option in options]
+
+        nonterminals = list(dict.fromkeys(grammar.VN))
+        nonterminals += [symbol for symbol in dict.fromkeys([grammar.S] + [c for _, rhs in rules for c in rhs])
+                         if symbol not in vocabulary]
+        terminals = sorted(set(grammar.VT) - declared)
+        self.names: List[str] = nonterminals + terminals
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.nonterminal_count = len(nonterminals)
+        self.start = self.ids[grammar.S]
+        # Разделитель символов в записи цепочек и (с учётом нетерминалов) форм: пробел,
+        # если есть многосимвольные имена
+        self.separator = "" if all(len(name) == 1 for name in terminals) else " "
+        self.form_separator = "" if all(len(name) == 1 for name in self.names) else " "
+
+        self.rule_lhs: List[int] = [self.ids[left] for left, _ in rules]
+        self.rule_rhs: List[Tuple[int, ...]] = [tuple(self.ids[c] for c in rhs) for _, rhs in rules]
+        by_lhs = [[] for _ in range(self.nonterminal_count)]
+        for rule, left in enumerate(self.rule_lhs):
+            by_lhs[left].append(rule)
+        self.rules_by_lhs: List[Tuple[int, ...]] = [tuple(group) for group in by_lhs]
+        self.productions: List[Tuple[Tuple[int, ...], ...]] = [
+            tuple(self.rule_rhs[rule] for rule in group) for group in self.rules_by_lhs]
+
+        self._spelling = {i: name + self.form_separator for i, name in enumerate(self.names)}
+        self._chain_spelling = {i: name + self.separator for i, name in enumerate(self.names)}
+        self._boundary = chr(self.nonterminal_count)
+        self._compute_nullable()
+        self._compute_min_yield()
+        self._compute_useful()
+        self._compute_max_yield()
+        self._compute_first_follow()
+
+    def is_terminal(self, symbol: int) -> bool:
+        return symbol >= self.nonterminal_count
+
+    def pack(self, symbols: Iterable[int]) -> str:
+        # Сентенциальная форма в виде строки из символов с кодами-номерами:
+        # срезы и хеширование таких строк выполняются без кода на Python
+        return "".join(map(chr, symbols))
+
+    def spell(self, form) -> str:
+        # Запись формы (упакованной строки или последовательности номеров) именами символов
+        if not isinstance(form, str):
+            form = self.pack(form)
+        if not form:
+            return ""
+        if min(form) >= self._boundary:
+            text, separator = form.translate(self._chain_spelling), self.separator
+        else:
+            text, separator = form.translate(self._spelling), self.form_separator
+        return text[:-1] if separator else text
+
+    def encode(self, chain: str) -> Tuple[int, ...]:
+        # Номера терминалов цепочки; ValueError, если в ней есть неизвестный символ
+        symbols = []
+        for token in tokenize(chain, self.names[self.nonterminal_count:]):
+            symbol = self.ids.get(token)
+            if symbol is None or symbol < self.nonterminal_count:
+                raise ValueError(f"Неизвестный терминал '{token}'")
+            symbols.append(symbol)
+        return tuple(symbols)
+
+    def _compute_nullable(self):
+        self.nullable: List[bool] = [False] * len(self.names)
+        changed = True
+        while changed:
+            changed = False
+            for left, rhs in zip(self.rule_lhs, self.rule_rhs):
+                if not self.nullable[left] and all(self.nullable[c] for c in rhs):
+                    self.nullable[left] = True
+                    changed = True
+
+    def _compute_min_yield(self):
+        # Минимальная длина терминальной цепочки, выводимой из символа;
+        # у непродуктивных нетерминалов - бесконечность
+        nt = self.nonterminal_count
+        best = [INF] * nt + [1] * (len(self.names) - nt)
+        changed = True
+        while changed:
+            changed = False
+            for left, rhs in zip(self.rule_lhs, self.rule_rhs):
+                value = sum(best[c] for c in rhs)
+                if value < best[left]:
+                    best[left] = value
+                    changed = True
+        self.min_yield: List[float] = best
+
+    def _compute_useful(self):
+        nt = self.nonterminal_count
+        self.productive: FrozenSet[int] = frozenset(s for s in range(nt) if self.min_yield[s] < INF)
+        # Правила, все символы которых продуктивны
+        self.productive_rules: List[int] = [
+            rule for rule, rhs in enumerate(self.rule_rhs)
+            if self.rule_lhs[rule] in self.productive and all(c >= nt or c in self.productive for c in rhs)]
+        self.reachable: FrozenSet[int] = self._reach(range(len(self.rule_lhs)))
+        # Полезные нетерминалы: продуктивные и достижимые из начального по продуктивным правилам
+        self.useful: FrozenSet[int] = (self._reach(self.productive_rules)
+                                       if self.start in self.productive else frozenset())
+        self.useful_rules: List[int] = [rule for rule in self.productive_rules if self.rule_lhs[rule] in self.useful]
+
+    def _reach(self, rules: Iterable[int]) -> FrozenSet[int]:
+        edges = [[] for _ in range(self.nonterminal_count)]
+        for rule in rules:
+            edges[self.rule_lhs[rule]].extend(c for c in self.rule_rhs[rule] if c < self.nonterminal_count)
+        seen = {self.start}
+        stack = [self.start]
+        while stack:
+            for symbol in edges[stack.pop()]:
+                if symbol not in seen:
+                    seen.add(symbol)
+                    stack.append(symbol)
+        return frozenset(seen)
+
+    def _compute_max_yield(self):
+        # Максимальная длина выводимой цепочки: бесконечность, если из символа выводится
+        # форма с «накачиваемым» нетерминалом X =>+ uXv, где из uv выводится непустая цепочка;
+        # у непродуктивных нетерминалов - минус бесконечность
+        nt = self.nonterminal_count
+        nonempty = [False] * nt + [True] * (len(self.names) - nt)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.productive_rules:
+                left = self.rule_lhs[rule]
+                if not nonempty[left] and any(nonempty[c] for c in self.rule_rhs[rule]):
+                    nonempty[left] = True
+                    changed = True
+
+        edges = [set() for _ in range(nt)]
+        strict = []
+        for rule in self.productive_rules:
+            left, rhs = self.rule_lhs[rule], self.rule_rhs[rule]
+            for i, c in enumerate(rhs):
+                if c < nt:
+                    edges[left].add(c)
+                    if any(nonempty[other] for other in rhs[:i] + rhs[i + 1:]):
+                        strict.append((left, c))
+
+        def reaches(source, target):
+            seen = {source}
+            stack = [source]
+            while stack:
+                symbol = stack.pop()
+                if symbol == target:
+                    return True
+                for child in edges[symbol]:
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+            return False
+
+        pumping = {left for left, child in strict if reaches(child, left)}
+        best = [-INF] * nt + [1] * (len(self.names) - nt)
+        for symbol in range(nt):
+            if any(reaches(symbol, other) for other in pumping):
+                best[symbol] = INF
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.productive_rules:
+                left = self.rule_lhs[rule]
+                value = sum(best[c] for c in self.rule_rhs[rule])
+                if value > best[left]:
+                    best[left] = value
+                    changed = True
+        self.max_yield: List[float] = best
+
+    def first_of(self, symbols: Sequence[int]) -> Tuple[set, bool]:
+        # FIRST последовательности символов и признак того, что она аннулируема
+        result = set()
+        for c in symbols:
+            result |= self.first[c]
+            if not self.nullable[c]:
+                return result, False
+        return result, True
+
+    def _compute_first_follow(self):
+        # FIRST считается по продуктивным правилам, FOLLOW - по полезным
+        nt = self.nonterminal_count
+        self.first: List[set] = [set() for _ in range(nt)] + [{c} for c in range(nt, len(self.names))]
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.productive_rules:
+                left = self.rule_lhs[rule]
+                symbols, _ = self.first_of(self.rule_rhs[rule])
+                if not symbols <= self.first[left]:
+                    self.first[left] |= symbols
+                    changed = True
+
+        self.follow: List[set] = [set() for _ in range(nt)]
+        if self.useful:
+            self.follow[self.start].add(END)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.useful_rules:
+                left, rhs = self.rule_lhs[rule], self.rule_rhs[rule]
+                for i, c in enumerate(rhs):
+                    if c >= nt:
+                        continue
+                    symbols, tail_nullable = self.first_of(rhs[i + 1:])
+                    if tail_nullable:
+                        symbols = symbols | self.follow[left]
+                    if not symbols <= self.follow[c]:
+                        self.follow[c] |= symbols
+                        changed = True
+
+    def is_ll1(self) -> bool:
+        # Полезная часть грамматики LL(1) - достаточное условие однозначности
+        useful_rules = set(self.useful_rules)
+        for left in self.useful:
+            seen = set()
+            nullable_options = 0
+            for rule in self.rules_by_lhs[left]:
+                if rule not in useful_rules:
+                    continue
+                symbols, option_nullable = self.first_of(self.rule_rhs[rule])
+                if option_nullable:
+                    nullable_options += 1
+                    symbols = symbols | self.follow[left]
+                if seen & symbols or nullable_options > 1:
+                    return False
+                seen |= symbols
+        return True
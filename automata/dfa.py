@@ -0,0 +1,336 @@
+import mmap
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # пакетная проверка работает и без NumPy, только медленнее
+    np = None
+
+CHUNK_SIZE = 1 << 20  # Размер куска файла при потоковой проверке
+# progress(прочитано байт, всего байт) вызывается после каждого куска файла;
+# исключение из него прерывает проверку
+Progress = Callable[[int, int], None]
+
+
+@dataclass
+class RunResult:
+    accepted: bool
+    state: str  # Состояние, в котором автомат остановился
+    position: int  # Число прочитанных символов
+    error: Optional[str] = None  # "symbol" - символа нет в алфавите, "transition" - нет перехода
+    trace: Optional[List[Tuple[str, int]]] = None  # (состояние, позиция) перед каждым шагом
+
+
+class CompiledDFA:
+    # ДКА с плотной таблицей переходов: состояния и символы заменены номерами,
+    # отсутствующие переходы ведут в мёртвое состояние с номером len(states),
+    # из которого автомат уже не выходит.
+    def __init__(self, states: Iterable[str], alphabet: Iterable[str], transitions: Dict[str, Dict[str, str]],
+                 start: str, accepting: Iterable[str]):
+        # Состояния, встречающиеся только в переходах, добавляются в конец
+        self.state_ids: Dict[str, int] = {}
+        for state in [*states, *(target for state, moves in transitions.items() for target in [state, *moves.values()]),
+                      start]:
+            self.state_ids.setdefault(state, len(self.state_ids))
+        self.states: List[str] = list(self.state_ids)
+        self.symbols: List[str] = list(dict.fromkeys(alphabet))
+        self.symbol_ids: Dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.dead = len(self.states)
+        self.start = self.state_ids[start]
+        accepting = set(accepting)
+        self.accepting: List[bool] = [state in accepting for state in self.states] + [False]
+
+        # table[q][a] - номер следующего состояния
+        self.table: List[List[int]] = [[self.dead] * len(self.symbols) for _ in range(self.dead + 1)]
+        for state, moves in transitions.items():
+            row = self.table[self.state_ids[state]]
+            for symbol, target in moves.items():
+                if symbol in self.symbol_ids:
+                    row[self.symbol_ids[symbol]] = self.state_ids[target]
+
+        # Для быстрого прохода: одномерная таблица, в которой состояние хранится
+        # сразу как смещение своей строки (q * |V|)
+        width = max(len(self.symbols), 1)
+        self._width = width
+        self._flat: List[int] = [target * width for row in self.table for target in row]
+
+    @classmethod
+    def from_machine(cls, machine) -> "CompiledDFA":
+        # Автомат из lab2.Machine (Q, V, Func, Start, End)
+        return cls(machine.Q, machine.V, machine.Func, machine.Start, machine.End)
+
+    def accepts(self, word) -> bool:
+        # Проверка без трассировки: один проход по слову без срезов
+        flat = self._flat
+        ids = self.symbol_ids
+        offset = self.start * self._width
+        try:
+            for c in word:
+                offset = flat[offset + ids[c]]
+        except KeyError:
+            return False
+        return self.accepting[offset // self._width]
+
+    def run(self, word, trace: bool = False) -> RunResult:
+        # Итеративный проход по слову. Если trace, запоминается состояние и позиция
+        # перед каждым шагом; иначе при ошибке позиция находится повторным проходом.
+        if not trace:
+            flat = self._flat
+            ids = self.symbol_ids
+            offset = self.start * self._width
+            try:
+                for c in word:
+                    offset = flat[offset + ids[c]]
+            except KeyError:
+                return self._run(word, None)
+            state = offset // self._width
+            if state != self.dead:
+                return RunResult(self.accepting[state], self.states[state], len(word))
+            return self._run(word, None)
+        return self._run(word, [])
+
+    def _run(self, word, steps: Optional[List[Tuple[str, int]]]) -> RunResult:
+        table = self.table
+        ids = self.symbol_ids
+        state = self.start
+        for position, c in enumerate(word):
+            if steps is not None:
+                steps.append((self.states[state], position))
+            symbol = ids.get(c)
+            if symbol is None:
+                return RunResult(False, self.states[state], position, "symbol", steps)
+            target = table[state][symbol]
+            if target == self.dead:
+                return RunResult(False, self.states[state], position, "transition", steps)
+            state = target
+        return RunResult(self.accepting[state], self.states[state], len(word), None, steps)
+
+    def run_batch(self, words: Sequence[str]):
+        # Проверка многих слов за один вызов. Возвращает (accepted, states): признак
+        # принятия и номер конечного состояния для каждого слова (self.dead, если
+        # встретился символ вне алфавита или не нашлось перехода). С NumPy это массивы,
+        # без него - списки.
+        if np is not None and words:
+            return self._run_batch_numpy(words)
+        flat = self._flat
+        ids = self.symbol_ids
+        width = self._width
+        dead = self.dead * width
+        start = self.start * width
+        states = []
+        for word in words:
+            offset = start
+            try:
+                for c in word:
+                    offset = flat[offset + ids[c]]
+            except KeyError:
+                offset = dead
+            states.append(offset // width)
+        accepting = self.accepting
+        return [accepting[state] for state in states], states
+
+    def _run_batch_numpy(self, words: Sequence[str]):
+        # Все слова записаны подряд в один массив номеров символов (начало слова -
+        # смещение в нём). Слова упорядочены по убыванию длины, поэтому шаг j - одна
+        # векторная выборка из таблицы для префикса массива состояний (слов длиннее j).
+        # Неизвестный символ получает номер дополнительного столбца, ведущего в мёртвое состояние.
+        width = len(self.symbols) + 1
+        flat = np.array([target * width for row in self.table for target in row + [self.dead]], dtype=np.int64)
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        codes = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+        # Таблица перекодировки по кодам знаков, встретившихся во входе
+        lookup = np.full(int(codes.max()) + 1 if len(codes) else 1, width - 1, dtype=np.int64)
+        for symbol, i in self.symbol_ids.items():
+            if len(symbol) == 1 and ord(symbol) < len(lookup):
+                lookup[ord(symbol)] = i
+        symbols = lookup[codes]
+
+        starts = np.zeros(len(words), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        order = np.argsort(-lengths, kind="stable")
+        sorted_lengths = lengths[order]
+        sorted_starts = starts[order]
+        # active[j] - число слов длиннее j
+        active = np.searchsorted(-sorted_lengths, -np.arange(sorted_lengths[0]), side="left")
+        states = np.full(len(words), self.start * width, dtype=np.int64)
+        for j, count in enumerate(active.tolist()):
+            states[:count] = flat[states[:count] + symbols[sorted_starts[:count] + j]]
+
+        final = np.empty_like(states)
+        final[order] = states // width
+        accepting = np.array(self.accepting, dtype=bool)
+        return accepting[final], final
+
+    def run_file(self, filename: str):
+        # run_batch для файла со словами по одному в строке
+        return self.run_batch(read_words(filename))
+
+    def byte_lookup(self) -> bytes:
+        # 256 элементов: номер символа алфавита для каждого байта. Байты вне алфавита
+        # (и символы, не помещающиеся в один байт) получают номер len(symbols).
+        unknown = len(self.symbols)
+        lookup = bytearray([unknown] * 256)
+        for symbol, i in self.symbol_ids.items():
+            if len(symbol) == 1 and ord(symbol) < 256:
+                lookup[ord(symbol)] = i
+        return bytes(lookup)
+
+    def accepts_file(self, filename: str, chunk_size: int = CHUNK_SIZE, progress: Optional[Progress] = None) -> bool:
+        # Принимает ли автомат содержимое файла целиком. Файл отображается в память
+        # и читается кусками, поэтому расход памяти не зависит от его размера.
+        lookup = self.byte_lookup()
+        width = len(self.symbols) + 1
+        flat = [target * width for row in self.table for target in row + [self.dead]]
+        dead = self.dead * width
+        offset = self.start * width
+        for chunk in _chunks(filename, chunk_size, progress):
+            for symbol in chunk.translate(lookup):
+                offset = flat[offset + symbol]
+            if offset == dead:
+                return False
+        return self.accepting[offset // width]
+
+    def iter_matches(self, filename: str, chunk_size: int = CHUNK_SIZE,
+                     progress: Optional[Progress] = None) -> Iterator[int]:
+        # Поиск подстрок языка: отдаёт каждое смещение конца (число прочитанных байт),
+        # на котором заканчивается хотя бы одно слово языка. Это проход автомата для
+        # Σ*L: его состояния - множества состояний исходного ДКА, запущенного
+        # с каждой позиции. Они строятся лениво, только для встретившихся переходов.
+        lookup = self.byte_lookup()
+        width = len(self.symbols) + 1
+        start = frozenset([self.start])
+        subsets = [start]
+        index = {start: 0}
+        accepting = [self.accepting[self.start]]
+        table = [[-1] * width]
+
+        def move(current, symbol):
+            if symbol == width - 1:
+                target = start  # байт вне алфавита обрывает все начатые слова
+            else:
+                target = frozenset(self.table[q][symbol] for q in subsets[current]) - {self.dead} | start
+            if target not in index:
+                index[target] = len(subsets)
+                subsets.append(target)
+                accepting.append(any(self.accepting[q] for q in target))
+                table.append([-1] * width)
+            table[current][symbol] = index[target]
+            return index[target]
+
+        current = 0
+        position = 0
+        if accepting[current]:
+            yield position
+        for chunk in _chunks(filename, chunk_size, progress):
+            for symbol in chunk.translate(lookup):
+                position += 1
+                target = table[current][symbol]
+                current = target if target >= 0 else move(current, symbol)
+                if accepting[current]:
+                    yield position
+
+    def transitions(self) -> Dict[str, Dict[str, str]]:
+        # Таблица переходов по именам, без переходов в мёртвое состояние
+        result = {}
+        for state, row in zip(self.states, self.table):
+            moves = {symbol: self.states[target] for symbol, target in zip(self.symbols, row) if target != self.dead}
+            if moves:
+                result[state] = moves
+        return result
+
+    def accepting_states(self) -> List[str]:
+        return [state for state, accepting in zip(self.states, self.accepting) if accepting]
+
+    def minimize(self) -> Tuple["CompiledDFA", List[Optional[int]]]:
+        # Минимальный ДКА алгоритмом Хопкрофта и отображение старых номеров состояний
+        # в новые (None для недостижимых). Состояния, эквивалентные мёртвому,
+        # удаляются вместе с переходами в них; каждое новое состояние носит имя
+        # первого из слитых в него старых.
+        width = len(self.symbols)
+        reachable = [False] * (self.dead + 1)
+        reachable[self.start] = reachable[self.dead] = True
+        stack = [self.start]
+        while stack:
+            for target in self.table[stack.pop()]:
+                if not reachable[target]:
+                    reachable[target] = True
+                    stack.append(target)
+        states = [q for q in range(self.dead + 1) if reachable[q]]
+
+        inverse = [[[] for _ in range(self.dead + 1)] for _ in range(width)]
+        for q in states:
+            for symbol, target in enumerate(self.table[q]):
+                inverse[symbol][target].append(q)
+
+        final = [q for q in states if self.accepting[q]]
+        rest = [q for q in states if not self.accepting[q]]
+        blocks = [set(block) for block in (final, rest) if block]
+        block_of = [0] * (self.dead + 1)
+        for b, block in enumerate(blocks):
+            for q in block:
+                block_of[q] = b
+        # Разбиение уточняется относительно блоков-разделителей; из двух половин
+        # расщеплённого блока в очередь достаточно добавить меньшую
+        waiting = {min(range(len(blocks)), key=lambda b: len(blocks[b]))}
+        while waiting:
+            splitter = list(blocks[waiting.pop()])
+            for symbol in range(width):
+                touched: Dict[int, List[int]] = {}
+                for q in splitter:
+                    for p in inverse[symbol][q]:
+                        touched.setdefault(block_of[p], []).append(p)
+                for b, members in touched.items():
+                    if len(members) == len(blocks[b]):
+                        continue
+                    part = set(members)
+                    blocks[b] -= part
+                    blocks.append(part)
+                    new = len(blocks) - 1
+                    for p in part:
+                        block_of[p] = new
+                    if b in waiting or len(part) <= len(blocks[b]):
+                        waiting.add(new)
+                    else:
+                        waiting.add(b)
+
+        dead_block = block_of[self.dead]
+        order = sorted((min(block), b) for b, block in enumerate(blocks) if b != dead_block)
+        names = {b: self.states[first] for first, b in order}
+        transitions = {}
+        for first, b in order:
+            moves = {}
+            for symbol, target in zip(self.symbols, self.table[first]):
+                if block_of[target] != dead_block:
+                    moves[symbol] = names[block_of[target]]
+            transitions[names[b]] = moves
+        minimal = CompiledDFA([names[b] for _, b in order], self.symbols, transitions,
+                              names[block_of[self.start]] if block_of[self.start] != dead_block else self.states[self.start],
+                              [names[b] for first, b in order if self.accepting[first]])
+        mapping: List[Optional[int]] = []
+        for q in range(self.dead + 1):
+            if not reachable[q]:
+                mapping.append(None)
+            elif block_of[q] == dead_block:
+                # пустой язык: начальное состояние остаётся единственным состоянием автомата
+                mapping.append(minimal.start if q == self.start else minimal.dead)
+            else:
+                mapping.append(minimal.state_ids[names[block_of[q]]])
+        return minimal, mapping
+
+
+def _chunks(filename: str, chunk_size: int, progress: Optional[Progress] = None) -> Iterator[bytes]:
+    # Куски файла; progress вызывается перед чтением следующего куска
+    with open(filename, "rb") as file:
+        if not file.seek(0, 2):
+            return  # пустой файл нельзя отобразить в память
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for begin in range(0, len(data), chunk_size):
+                yield data[begin:begin + chunk_size]
+                if progress is not None:
+                    progress(min(begin + chunk_size, len(data)), len(data))
+
+
+def read_words(filename: str) -> List[str]:
+    with open(filename, "r", encoding="utf-8") as file:
+        return file.read().splitlines()
@@ -0,0 +1,356 @@
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+EPS = ("ε", "EPS")  # Обозначения пустой цепочки в правилах
+PROGRESS_INTERVAL = 1 << 16  # Символов цепочки между вызовами progress в CompiledDPDA.run
+
+Rule = List[str]  # [состояние, символ, верх стека, новое состояние, запись в стек, ...]
+
+
+def format_rule(rule: Rule) -> str:
+    # У МП-преобразователя в правой части есть ещё выходная цепочка
+    return f"({rule[0]}, {rule[1]}, {rule[2]}) -> ({', '.join(rule[3:])})"
+
+
+def push_symbols(push: str) -> Tuple[str, ...]:
+    # Символы, которые кладутся в стек вместо верхнего, в порядке добавления в список:
+    # стек хранится списком с верхом в конце, поэтому запись правила разворачивается
+    # и её первый символ оказывается наверху
+    return () if push in EPS else tuple(reversed(push))
+
+
+@dataclass
+class DPDAResult:
+    accepted: bool
+    state: str  # Состояние, в котором автомат остановился
+    position: int  # Число прочитанных символов
+    stack: str  # Содержимое стека при остановке, верхний символ первый
+    max_depth: int  # Наибольшая глубина стека за время работы
+    steps: int  # Число применённых правил
+    error: Optional[str] = None  # "symbol" - символа нет в алфавите, "transition" - нет правила
+    trace: Optional[List[Tuple[str, str, str, Optional[Rule]]]] = None  # Шаги или DPDATrace, см. CompiledDPDA.run
+
+
+class CompiledDPDA:
+    # ДМПА с правилами, разложенными по словарям при загрузке: шаг автомата - один поиск
+    # по ключу (состояние, символ, верхний символ стека) вместо перебора всех правил.
+    # ε-правила лежат в отдельном индексе по ключу (состояние, верхний символ стека)
+    # и применяются, когда для текущего символа нет правила со входом, а также после
+    # чтения всей цепочки. Правила со входом имеют приоритет, поэтому ε-правило
+    # и правило со входом для одной пары (состояние, верх стека) не конфликтуют.
+    def __init__(self, states: Iterable[str], alphabet: Iterable[str], rules: Iterable[Rule],
+                 start: str, start_stack: str, end):
+        self.states: List[str] = list(states)
+        self.alphabet: List[str] = list(alphabet)
+        self.start = start
+        self.start_stack = start_stack
+        # Заключительное состояние в файлах задаётся строкой или списком
+        self.end = set(end) if isinstance(end, (list, tuple, set)) else {end}
+        self.rules: Dict[Tuple[str, str, str], Rule] = {}
+        self.epsilon_rules: Dict[Tuple[str, str], Rule] = {}
+        for rule in rules:
+            if rule[1] in EPS:
+                index, key = self.epsilon_rules, (rule[0], rule[2])
+            else:
+                index, key = self.rules, (rule[0], rule[1], rule[2])
+            other = index.setdefault(key, rule)
+            # Повтор того же правила допустим, разные действия для одного ключа - нет
+            if other is not rule and _action(other) != _action(rule):
+                raise ValueError(f"Автомат недетерминирован: правила {format_rule(other)} и {format_rule(rule)}")
+        # Детерминирован и в обычном смысле, когда ε-правило и правило со входом
+        # не встречаются для одной пары (состояние, верх стека): тогда приоритет правил
+        # со входом ничего не решает, и результат совпадает с перебором конфигураций (NPDA)
+        input_keys = {(state, top) for state, _, top in self.rules}
+        self.strictly_deterministic = not any(key in input_keys for key in self.epsilon_rules)
+        loop = self._epsilon_loop()
+        if loop is not None:
+            raise ValueError(f"Автомат зацикливается на ε-правилах, начиная с правила {format_rule(loop)}")
+        self._compile_tables()
+
+    def _epsilon_loop(self) -> Optional[Rule]:
+        # ε-правило, с которого начинается бесконечная цепочка ε-шагов, или None.
+        # Для пары (состояние, верх стека) ищется, в каком состоянии ε-правила снимут
+        # этот верх вместе со всем, что положат вместо него (или что они остановятся).
+        # Если при этом снова встречается пара, для которой поиск ещё идёт, автомат
+        # повторяет её с тем же или более глубоким стеком бесконечно: проход по такому
+        # автомату не остановился бы, поэтому он отвергается при загрузке.
+        popped: Dict[Tuple[str, str], Optional[str]] = {}  # None - ε-шаги останавливаются
+        active = set()
+
+        def enter(key):
+            rule = self.epsilon_rules.get(key)
+            if rule is None:
+                popped[key] = None
+                return None
+            active.add(key)
+            # [пара, текущее состояние, ещё не снятые символы с верхом в конце]
+            return [key, rule[3], list(push_symbols(rule[4]))]
+
+        for root in self.epsilon_rules:
+            if root in popped:
+                continue
+            stack = [enter(root)]
+            while stack:
+                frame = stack[-1]
+                key, state, pending = frame
+                if pending:
+                    child = (state, pending[-1])
+                    if child in active:
+                        return self.epsilon_rules[child]
+                    if child not in popped:
+                        child_frame = enter(child)
+                        if child_frame is not None:
+                            stack.append(child_frame)
+                            continue
+                    if popped[child] is not None:
+                        pending.pop()
+                        frame[1] = popped[child]
+                        continue
+                    state = None
+                popped[key] = state
+                active.discard(key)
+                stack.pop()
+        return None
+
+    def _compile_tables(self):
+        # Таблицы для прохода: состояния и символы стека заменены номерами, а пара
+        # (состояние, верх стека) - одним управляющим номером state * width + top, который
+        # сразу выбирает строку правил. На дне стека лежит служебный символ с номером
+        # width - 1: правил для него нет, зато у пустого стека тоже есть верхний символ.
+        # Замена верхнего символа - одно присваивание среза stack[-1:] = символы правила.
+        # Правило в таблице - (управляющий номер нового состояния без верха, символы
+        # для стека, выход, исходное правило).
+        state_ids: Dict[str, int] = {}
+        for state in [self.start, *self.states, *(rule[i] for index in (self.rules, self.epsilon_rules)
+                                                   for rule in index.values() for i in (0, 3))]:
+            state_ids.setdefault(state, len(state_ids))
+        stack_ids: Dict[str, int] = {}
+        for symbol in [*push_symbols(self.start_stack),
+                       *(c for index in (self.rules, self.epsilon_rules) for rule in index.values()
+                         for c in (rule[2], *push_symbols(rule[4])))]:
+            stack_ids.setdefault(symbol, len(stack_ids))
+        width = len(stack_ids) + 1
+        bottom = width - 1
+        self._width = width
+        self._state_names: List[str] = list(state_ids)
+        self._stack_names: List[str] = list(stack_ids) + [""]
+
+        def compile_rule(rule):
+            out = rule[5] if len(rule) > 5 and rule[5] not in EPS else ""
+            return state_ids[rule[3]] * width, tuple(stack_ids[c] for c in push_symbols(rule[4])), out, rule
+
+        # Для каждого символа алфавита - столбец правил по управляющим номерам
+        controls = len(state_ids) * width
+        self._columns: Dict[str, List[Optional[tuple]]] = {symbol: [None] * controls for symbol in self.alphabet}
+        self._epsilon_row: List[Optional[tuple]] = [None] * controls
+        for (state, symbol, top), rule in self.rules.items():
+            if symbol in self._columns:
+                self._columns[symbol][state_ids[state] * width + stack_ids[top]] = compile_rule(rule)
+        for (state, top), rule in self.epsilon_rules.items():
+            self._epsilon_row[state_ids[state] * width + stack_ids[top]] = compile_rule(rule)
+        self._start_stack: List[int] = [bottom, *(stack_ids[c] for c in push_symbols(self.start_stack))]
+        self._start_control = state_ids[self.start] * width + self._start_stack[-1]
+        # Цепочка принята, когда стек пуст (наверху дно) в заключительном состоянии
+        self._accepting = frozenset(state_ids[state] * width + bottom for state in self.end if state in state_ids)
+
+    def _spell_stack(self, stack: List[int]) -> str:
+        # Запись стека, как в файлах автоматов: верхний символ первый
+        names = self._stack_names
+        return "".join(names[c] for c in reversed(stack))
+
+    @classmethod
+    def from_machine(cls, machine) -> "CompiledDPDA":
+        # Автомат из lab3.Machine или lab4.Machine
+        return cls(machine.Q, machine.V, machine.Rules, machine.Start_state, machine.Start_stack, machine.End)
+
+    def move(self, state: str, symbol: str, top: str) -> Optional[Rule]:
+        return self.rules.get((state, symbol, top))
+
+    def epsilon_move(self, state: str, top: str) -> Optional[Rule]:
+        return self.epsilon_rules.get((state, top))
+
+    def is_final(self, state: str) -> bool:
+        return state in self.end
+
+    def run(self, word, trace: bool = False, compact: bool = False,
+            progress: Optional[Callable[[int, int], None]] = None) -> DPDAResult:
+        # Проверка цепочки без вывода шагов. Если trace, в результат попадают шаги:
+        # (состояние, символ или ε, стек, применённое правило или None при ошибке).
+        # Если compact, шаги пишутся в DPDATrace - по четыре числа на шаг, без записи стека.
+        # trace может быть и готовым объектом с методом record (DPDATrace, TraceWriter).
+        # progress(прочитано символов, всего символов) вызывается каждые PROGRESS_INTERVAL
+        # символов; исключение из него прерывает проверку.
+        trace = DPDATrace(self) if compact else trace
+        if progress is not None:
+            word = _reading(word, progress)
+        accepted, state, position, stack, max_depth, steps, error, _, history = self._execute(word, trace)
+        return DPDAResult(accepted, state, position, stack, max_depth, steps, error, history)
+
+    def _execute(self, word, trace):
+        # Стек - список номеров с верхом в конце, поэтому замена верхнего символа стоит
+        # O(длины записи правила), и вся проверка линейна по длине цепочки.
+        # Выход правил (шестое поле у МП-преобразователя) собирается в список.
+        # trace - False, True (шаги списком) или объект с методом record, в который
+        # пишутся шаги (DPDATrace, tracefile.TraceWriter).
+        # Возвращает (принята, состояние, позиция, стек, глубина, шаги, ошибка, выход, шаги трассы).
+        columns = self._columns
+        epsilon_row = self._epsilon_row
+        width = self._width
+        stack = self._start_stack[:]
+        control = self._start_control
+        max_depth = len(stack)
+        steps = 0
+        position = 0
+        output = []
+        record = getattr(trace, "record", None)
+        if record is not None:
+            history = trace
+        elif trace:
+            history = []
+
+            def record(control, symbol, stack, move):
+                history.append((self._state_names[control // width], symbol, self._spell_stack(stack),
+                                move[3] if move else None))
+        else:
+            history = None
+        trace = history is not None
+        error = None
+        for symbol in word:
+            column = columns.get(symbol)
+            if column is None:
+                error = "symbol"
+                break
+            move = column[control]
+            while move is None:
+                # Для символа нет правила - сначала ε-правило, затем снова поиск правила со входом
+                move = epsilon_row[control]
+                if trace:
+                    record(control, EPS[0] if move else symbol, stack, move)
+                if move is None:
+                    error = "transition"
+                    break
+                base, push, out, _ = move
+                stack[-1:] = push
+                control = base + stack[-1]
+                if len(stack) > max_depth:
+                    max_depth = len(stack)
+                if out:
+                    output.append(out)
+                steps += 1
+                move = column[control]
+            if error:
+                break
+            if trace:
+                record(control, symbol, stack, move)
+            base, push, out, _ = move
+            stack[-1:] = push
+            control = base + stack[-1]
+            if len(stack) > max_depth:
+                max_depth = len(stack)
+            if out:
+                output.append(out)
+            steps += 1
+            position += 1
+        else:
+            # После чтения цепочки - ε-правила, пока стек не опустеет в заключительном состоянии
+            accepting = self._accepting
+            while control not in accepting:
+                move = epsilon_row[control]
+                if trace:
+                    record(control, EPS[0], stack, move)
+                if move is None:
+                    error = "transition"
+                    break
+                base, push, out, _ = move
+                stack[-1:] = push
+                control = base + stack[-1]
+                if len(stack) > max_depth:
+                    max_depth = len(stack)
+                if out:
+                    output.append(out)
+                steps += 1
+        # Глубина считается без служебного дна
+        return (error is None, self._state_names[control // width], position, self._spell_stack(stack),
+                max_depth - 1, steps, error, output, history)
+
+
+def _reading(word, progress: Callable[[int, int], None]) -> Iterator[str]:
+    # Символы цепочки кусками; после каждого куска - вызов progress. Основной цикл
+    # автомата при этом не меняется, а без progress не платит за проверки
+    total = len(word)
+    for begin in range(0, total, PROGRESS_INTERVAL):
+        yield from word[begin:begin + PROGRESS_INTERVAL]
+        progress(min(begin + PROGRESS_INTERVAL, total), total)
+
+
+class DPDATrace:
+    # Компактная трасса ДМПА: шаг i - i-е элементы четырёх массивов чисел (состояние,
+    # символ, глубина стека до шага, правило), поэтому запись шага стоит O(1)
+    # независимо от глубины стека. Символ -1 - ε, правило -1 - правила нет (ошибка).
+    # Стек целиком не хранится: stack(i) восстанавливает его повтором правил.
+    def __init__(self, dpda: CompiledDPDA):
+        self.dpda = dpda
+        self.states = array("i")
+        self.symbols = array("i")
+        self.depths = array("i")
+        self.rules = array("i")
+        self.rule_list: List[Rule] = []  # Номер правила -> правило
+        self._moves: List[tuple] = []  # Номер правила -> правило из таблиц автомата
+        self._rule_ids: Dict[int, int] = {}
+        self._symbol_ids = {symbol: i for i, symbol in enumerate(dpda.alphabet)}
+
+    def record(self, control: int, symbol: str, stack: List[int], move: Optional[tuple]):
+        self.states.append(control // self.dpda._width)
+        self.symbols.append(self._symbol_ids.get(symbol, -1))
+        self.depths.append(len(stack) - 1)
+        if move is None:
+            self.rules.append(-1)
+            return
+        rule_id = self._rule_ids.get(id(move))
+        if rule_id is None:
+            rule_id = self._rule_ids[id(move)] = len(self._moves)
+            self._moves.append(move)
+            self.rule_list.append(move[3])
+        self.rules.append(rule_id)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def step(self, i: int) -> Tuple[str, str, int, Optional[Rule]]:
+        # (состояние, символ или ε, глубина стека, правило или None)
+        symbol = self.symbols[i]
+        rule = self.rules[i]
+        return (self.dpda._state_names[self.states[i]], EPS[0] if symbol < 0 else self.dpda.alphabet[symbol],
+                self.depths[i], self.rule_list[rule] if rule >= 0 else None)
+
+    def format_step(self, i: int) -> str:
+        state, symbol, depth, rule = self.step(i)
+        return f"{i + 1}. {state}, {symbol}, глубина {depth}: {format_rule(rule) if rule else 'нет правила'}"
+
+    def stack(self, i: int) -> str:
+        # Стек перед шагом i (верхний символ первый): правила шагов 0..i-1 применяются
+        # к начальному стеку, O(i)
+        stack = self.dpda._start_stack[:]
+        moves = self._moves
+        for rule in self.rules[:i]:
+            stack[-1:] = moves[rule][1]
+        return self.dpda._spell_stack(stack)
+
+    def find(self, text: str, start: int = 0) -> int:
+        # Номер первого шага не раньше start, у которого text входит в имя состояния,
+        # символ или запись правила, или -1. Подходящие номера находятся по справочникам
+        # один раз, проход по шагам сравнивает только числа.
+        states = {i for i, name in enumerate(self.dpda._state_names) if text in name}
+        symbols = {i for i, symbol in enumerate(self.dpda.alphabet) if text in symbol}
+        if text in EPS[0]:
+            symbols.add(-1)
+        rules = {i for i, rule in enumerate(self.rule_list) if text in format_rule(rule)}
+        for i in range(start, len(self)):
+            if self.states[i] in states or self.symbols[i] in symbols or self.rules[i] in rules:
+                return i
+        return -1
+
+
+def _action(rule: Rule) -> tuple:
+    return tuple("" if item in EPS else item for item in rule[3:])
@@ -0,0 +1,440 @@
+import gc
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .compiled_grammar import CompiledGrammar
+
+
+class TreeNode:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.children: List[TreeNode] = []
+
+    def add_child(self, child: "TreeNode"):
+        self.children.append(child)
+
+    def __repr__(self):
+        return f"TreeNode({self.symbol})"
+
+
+class ForestNode:
+    # Узел разделяемого упакованного леса разбора (SPPF).
+    # Символьный узел: label - символ грамматики, покрывающий chain[start:end].
+    # Промежуточный узел: label - пара (номер правила, позиция точки).
+    # Каждая семья (families) - один способ разбора узла: (номер правила, левый, правый)
+    # для символьного узла и (левый, правый) для промежуточного; левый узел может быть None.
+    # Семьи вычисляются по таблице Эрли при первом обращении, поэтому лес
+    # раскрывается ровно настолько, насколько его обходят.
+    def __init__(self, label, start: int, end: int, terminal: bool = False, expand=None):
+        self.label = label
+        self.start = start
+        self.end = end
+        self.terminal = terminal
+        self._families: List[tuple] = []
+        self._expand = expand
+
+    @property
+    def families(self) -> List[tuple]:
+        if self._expand is not None:
+            expand, self._expand = self._expand, None
+            for family in expand():
+                if family not in self._families:
+                    self._families.append(family)
+        return self._families
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.families) > 1
+
+    def __repr__(self):
+        return f"ForestNode({self.label}, {self.start}, {self.end})"
+
+
+class _Chart:
+    def __init__(self, n: int):
+        # Ситуация - (номер правила, позиция точки, начало)
+        self.sets: List[set] = [set() for _ in range(n + 1)]
+        # ends[j][B] - начала, из которых B завершён в j
+        self.ends: List[Dict[int, List[int]]] = [dict() for _ in range(n + 1)]
+        # completed[j][(B, начало)] - правила B, завершённые в j
+        self.completed: List[Dict[Tuple[int, int], List[int]]] = [dict() for _ in range(n + 1)]
+        # leo[i][B] - (ожидающая ситуация, верхняя ситуация) пути Лео или None
+        self.leo: List[Dict[int, Optional[tuple]]] = [dict() for _ in range(n + 1)]
+        # leo_links[j][верхняя ситуация] - (i, B): путь Лео, начатый завершением B из i
+        self.leo_links: List[Dict[tuple, List[Tuple[int, int]]]] = [dict() for _ in range(n + 1)]
+
+
+def _recognize(grammar: CompiledGrammar, chain: Tuple[int, ...]) -> Optional[_Chart]:
+    # Алгоритм Эрли с обработкой аннулируемых нетерминалов по Эйкоку-Хорспулу:
+    # при предсказании аннулируемого символа точка сразу переносится через него,
+    # поэтому ε-правила и левая рекурсия не требуют особых случаев. Правая рекурсия
+    # обрабатывается за линейное время транзитивными ситуациями Лео. Обратные ссылки
+    # не хранятся: разбиения восстанавливаются по таблице при построении леса.
+    # Для однозначной грамматики время обычно линейно, для неоднозначной (как
+    # A -> 0A1A | 1A0A | ε) ситуаций O(n^2), а время O(n^3) - в худшем случае
+    # алгоритм Эрли не быстрее.
+    n = len(chain)
+    nt = grammar.nonterminal_count
+    lhs, rhs_of, nullable = grammar.rule_lhs, grammar.rule_rhs, grammar.nullable
+    chart = _Chart(n)
+    sets, leo = chart.sets, chart.leo
+    waiting: List[Dict[int, List[Tuple[int, int, int]]]] = [dict() for _ in range(n + 1)]
+    # advanced[i][B] - те же ситуации с точкой, перенесённой через B: при завершении B
+    # новые из них находятся одной разностью множеств, а не проходом по списку
+    advanced: List[Dict[int, set]] = [dict() for _ in range(n + 1)]
+
+    def add(j, item, worklist):
+        if item not in sets[j]:
+            sets[j].add(item)
+            if worklist is not None:
+                worklist.append(item)
+
+    def transitive(i, symbol):
+        # Детерминированный путь свёрток Лео: если в множестве i символ ждёт ровно одна
+        # ситуация и точка в ней стоит перед последним символом, её завершение
+        # однозначно, и можно сразу перейти к самой верхней ситуации пути.
+        path = []
+        seen = set()
+        pos, current = i, symbol
+        top = None
+        while True:
+            if (pos, current) in seen:
+                # Цепные или аннулируемые циклы (A -> S, S -> A): у пути нет верхней
+                # ситуации, и ни одна его ситуация не должна пропускаться
+                for pos, current, _ in path:
+                    leo[pos][current] = None
+                return None
+            if current in leo[pos]:
+                step = leo[pos][current]
+                top = step[1] if step is not None else None
+                break
+            seen.add((pos, current))
+            items = waiting[pos].get(current, ())
+            # Начальный символ из множества 0 ждёт ещё и сам разбор: его завершение
+            # должно попасть в таблицу, иначе цепочка не будет принята
+            if (len(items) != 1 or items[0][1] + 1 != len(rhs_of[items[0][0]])
+                    or pos == 0 and current == grammar.start):
+                leo[pos][current] = None
+                break
+            rule, dot, origin = items[0]
+            path.append((pos, current, items[0]))
+            pos, current = origin, lhs[rule]
+        for pos, current, item in reversed(path):
+            rule, dot, origin = item
+            if top is None:
+                top = (rule, dot + 1, origin)
+            leo[pos][current] = (item, top)
+        return leo[i].get(symbol)
+
+    for rule in grammar.rules_by_lhs[grammar.start]:
+        add(0, (rule, 0, 0), None)
+
+    for j in range(n + 1):
+        worklist = list(sets[j])
+        if not worklist:
+            return None
+        predicted = set()
+        while worklist:
+            item = worklist.pop()
+            rule, dot, origin = item
+            rhs = rhs_of[rule]
+            if dot < len(rhs):
+                symbol = rhs[dot]
+                if symbol >= nt:
+                    if j < n and chain[j] == symbol:
+                        add(j + 1, (rule, dot + 1, origin), None)
+                    continue
+                waiting[j].setdefault(symbol, []).append(item)
+                advanced[j].setdefault(symbol, set()).add((rule, dot + 1, origin))
+                if symbol not in predicted:
+                    predicted.add(symbol)
+                    for other in grammar.rules_by_lhs[symbol]:
+                        add(j, (other, 0, j), worklist)
+                if nullable[symbol]:
+                    add(j, (rule, dot + 1, origin), worklist)
+            else:
+                left = lhs[rule]
+                bucket = chart.completed[j].setdefault((left, origin), [])
+                bucket.append(rule)
+                if len(bucket) > 1:
+                    continue  # ожидающие ситуации уже продвинуты первым правилом
+                chart.ends[j].setdefault(left, []).append(origin)
+                if origin == j:
+                    step = None
+                elif left in leo[origin]:
+                    step = leo[origin][left]  # путь уже вычислен при прошлом завершении
+                else:
+                    step = transitive(origin, left)
+                if step is not None:
+                    chart.leo_links[j].setdefault(step[1], []).append((origin, left))
+                    add(j, step[1], worklist)
+                    continue
+                parents = advanced[origin].get(left)
+                if parents:
+                    fresh = parents - sets[j]
+                    sets[j] |= fresh
+                    worklist.extend(fresh)
+    if (grammar.start, 0) not in chart.completed[n]:
+        return None
+    return chart
+
+
+class _Forest:
+    def __init__(self, grammar: CompiledGrammar, chain: Tuple[int, ...], chart: _Chart):
+        self.grammar = grammar
+        self.chain = chain
+        self.chart = chart
+        self.nodes: Dict[tuple, ForestNode] = {}
+
+    def symbol_node(self, symbol, i, j) -> ForestNode:
+        key = ("s", symbol, i, j)
+        node = self.nodes.get(key)
+        if node is None:
+            name = self.grammar.names[symbol]
+            if symbol < self.grammar.nonterminal_count:
+                node = ForestNode(name, i, j, expand=lambda: self._symbol_families(symbol, i, j))
+            else:
+                node = ForestNode(name, i, j, terminal=True)
+            self.nodes[key] = node
+        return node
+
+    def item_node(self, rule, dot, origin, j) -> ForestNode:
+        key = ("i", rule, dot, origin, j)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = ForestNode(
+                (rule, dot), origin, j, expand=lambda: self._item_families(rule, dot, origin, j))
+        return node
+
+    def _symbol_families(self, symbol, i, j):
+        families = []
+        for rule in dict.fromkeys(self.chart.completed[j].get((symbol, i), ())):
+            length = len(self.grammar.rule_rhs[rule])
+            if length == 0:
+                families.append((rule, None, None))
+                continue
+            for left, right in self._item_families(rule, length, i, j):
+                families.append((rule, left, right))
+        return families
+
+    def _item_families(self, rule, dot, origin, j):
+        # Семьи ситуации (rule, dot, origin) в множестве j: (левый узел, правый узел).
+        # Ищем все k, где предыдущая ситуация лежит в множестве k, а символ перед точкой
+        # покрывает chain[k:j].
+        sets = self.chart.sets
+        previous = (rule, dot - 1, origin)
+        symbol = self.grammar.rule_rhs[rule][dot - 1]
+        families = []
+        if symbol < self.grammar.nonterminal_count:
+            splits = [k for k in self.chart.ends[j].get(symbol, ()) if previous in sets[k]]
+        else:
+            splits = [j - 1] if j > 0 and self.chain[j - 1] == symbol and previous in sets[j - 1] else []
+        for k in splits:
+            left = self.item_node(rule, dot - 1, origin, k) if dot > 1 else None
+            families.append((left, self.symbol_node(symbol, k, j)))
+        for i, start in self.chart.leo_links[j].get((rule, dot, origin), ()):
+            family = self._leo_family(i, start, j)
+            if family not in families:
+                families.append(family)
+        return families
+
+    def _leo_family(self, i, symbol, j):
+        # Восстанавливает узлы, пропущенные путём Лео от завершения symbol в i до
+        # верхней ситуации, и возвращает семью (левый, правый) верхней ситуации
+        right = self.symbol_node(symbol, i, j)
+        pos, current = i, symbol
+        while True:
+            item, top = self.chart.leo[pos][current]
+            rule, dot, origin = item
+            left = self.item_node(rule, dot, origin, pos) if dot > 0 else None
+            if (rule, dot + 1, origin) == top:
+                return left, right
+            node = self.symbol_node(self.grammar.rule_lhs[rule], origin, j)
+            family = (rule, left, right)
+            if family not in node.families:
+                node.families.append(family)
+            right = node
+            pos, current = origin, self.grammar.rule_lhs[rule]
+
+
+def _children(family) -> list:
+    # Потомки семьи без служебного номера правила у символьного узла
+    return [child for child in family[-2:] if child is not None]
+
+
+def _choose_families(root: ForestNode) -> Dict[int, tuple]:
+    # Для каждого узла выбирает семью, из которой строится конечное дерево: семья
+    # выбирается, когда все её потомки уже «обоснованы», поэтому циклы в лесе
+    # (A -> A, аннулируемые циклы) в дерево не попадают.
+    nodes = []
+    seen = {id(root)}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        for family in node.families:
+            for child in _children(family):
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append(child)
+
+    chosen: Dict[int, tuple] = {}
+    missing = {}
+    parents: Dict[int, List[Tuple[ForestNode, int]]] = {}
+    ready = []
+    for node in nodes:
+        if node.terminal:
+            ready.append(node)
+            continue
+        for index, family in enumerate(node.families):
+            children = {id(child): child for child in _children(family)}
+            missing[(id(node), index)] = len(children)
+            for child in children.values():
+                parents.setdefault(id(child), []).append((node, index))
+            if not children and id(node) not in chosen:
+                chosen[id(node)] = family
+                ready.append(node)
+    while ready:
+        node = ready.pop()
+        for parent, index in parents.get(id(node), ()):
+            missing[(id(parent), index)] -= 1
+            if missing[(id(parent), index)] == 0 and id(parent) not in chosen:
+                chosen[id(parent)] = parent.families[index]
+                ready.append(parent)
+    return chosen
+
+
+def _unfold(node: ForestNode, choose) -> Optional[List[ForestNode]]:
+    # Разворачивает цепочку промежуточных узлов в список потомков правила
+    children = []
+    family = choose(node)
+    while family is not None:
+        left, right = family[-2], family[-1]
+        if right is not None:
+            children.append(right)
+        if left is None:
+            children.reverse()
+            return children
+        family = choose(left)
+    return None
+
+
+def forest_to_tree(root: ForestNode) -> TreeNode:
+    chosen = _choose_families(root)
+    tree = TreeNode(root.label)
+    stack = [(root, tree)]
+    while stack:
+        node, tree_node = stack.pop()
+        if node.terminal:
+            continue
+        for child in _unfold(node, lambda current: chosen[id(current)]):
+            child_tree = TreeNode(child.label)
+            tree_node.add_child(child_tree)
+            stack.append((child, child_tree))
+    return tree
+
+
+def _extract_tree(root: ForestNode) -> Tuple[Optional[TreeNode], bool]:
+    # Строит дерево обходом сверху вниз, беря первую семью узла, не ведущую в предка
+    # (циклы возможны только в циклических грамматиках). Попутно проверяет, есть ли
+    # у пройденных узлов другие семьи: если у цепочки два дерева, они расходятся
+    # в узле, который лежит на любом из них, поэтому этого достаточно для
+    # обнаружения неоднозначности. Возвращает (None, ...) при заходе в тупик.
+    ambiguous = False
+    on_path = set()
+
+    def choose(node):
+        nonlocal ambiguous
+        families = node.families
+        if len(families) > 1:
+            ambiguous = True
+        for family in families:
+            right = family[-1]
+            if right is None or id(right) not in on_path:
+                return family
+        return None
+
+    tree = TreeNode(root.label)
+    stack = [(root, tree)]
+    while stack:
+        node, tree_node = stack.pop()
+        if tree_node is None:
+            on_path.discard(id(node))
+            continue
+        if node.terminal:
+            continue
+        on_path.add(id(node))
+        stack.append((node, None))
+        children = _unfold(node, choose)
+        if children is None:
+            return None, ambiguous
+        for child in children:
+            child_tree = TreeNode(child.label)
+            tree_node.add_child(child_tree)
+            stack.append((child, child_tree))
+    return tree, ambiguous
+
+
+def is_ambiguous(root: ForestNode) -> bool:
+    seen = {id(root)}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.ambiguous:
+            return True
+        for family in node.families:
+            for child in _children(family):
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append(child)
+    return False
+
+
+def iter_derivation(tree: TreeNode, nonterminals, leftmost: bool = True) -> Iterator[Tuple[int, str, List[str]]]:
+    # Шаги левостороннего (или правостороннего) вывода по дереву за один обход:
+    # (позиция заменяемого нетерминала, нетерминал, символы замены). При левостороннем
+    # выводе позиция отсчитывается от начала сентенциальной формы, при правостороннем - от конца.
+    done = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.symbol not in nonterminals:
+            done += 1
+            continue
+        yield done, node.symbol, [child.symbol for child in node.children]
+        stack.extend(reversed(node.children) if leftmost else node.children)
+
+
+def parse_forest(grammar, chain: str) -> Optional[ForestNode]:
+    # Корень леса разбора цепочки или None, если цепочка не выводится.
+    # grammar - Grammar или уже построенная CompiledGrammar.
+    if not isinstance(grammar, CompiledGrammar):
+        grammar = CompiledGrammar(grammar)
+    try:
+        symbols = grammar.encode(chain)
+    except ValueError:
+        return None
+    # Таблица - миллионы мелких кортежей при длинной цепочке, и сборщик мусора,
+    # обходящий их снова и снова, замедлил бы разбор на треть
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        chart = _recognize(grammar, symbols)
+    finally:
+        if enabled:
+            gc.enable()
+    if chart is None:
+        return None
+    return _Forest(grammar, symbols, chart).symbol_node(grammar.start, 0, len(symbols))
+
+
+def parse(grammar, chain: str) -> Tuple[Optional[TreeNode], Optional[ForestNode]]:
+    # Строит дерево вывода цепочки. Возвращает (дерево, лес): лес возвращается только
+    # если цепочка имеет несколько деревьев вывода, иначе None. Если цепочка
+    # не выводится, возвращается (None, None).
+    forest = parse_forest(grammar, chain)
+    if forest is None:
+        return None, None
+    tree, ambiguous = _extract_tree(forest)
+    if tree is None:
+        tree, ambiguous = forest_to_tree(forest), is_ambiguous(forest)
+    return tree, forest if ambiguous else None
@@ -0,0 +1,342 @@
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .compiled_grammar import CompiledGrammar, tokenize
+from .earley import TreeNode, iter_derivation, parse
+from .normalize import Normalized, normalize, reduce_grammar
+
+# Сколько различных форм count_chains готов пройти, перебирая цепочки грамматики,
+# однозначность которой не доказана (около секунды работы)
+COUNT_ENUMERATION_LIMIT = 500_000
+
+
+class CountLimitExceeded(ValueError):
+    # Перебор различных цепочек в count_chains был бы слишком долгим; число деревьев
+    # вывода (derivations=True) при этом считается за полиномиальное время
+    pass
+
+
+@dataclass
+class Grammar:
+    VT: List[str]  # Терминальные символы
+    VN: List[str]  # Нетерминальные символы
+    P: Dict[str, List[str]]  # Правила вывода
+    S: str  # Начальный символ
+
+
+def parse_grammar_input(VT: str, VN: str, rules: List[str], S: str) -> Grammar:
+    VT_list = VT.split()
+    VN_list = VN.split()
+    P = {}
+    for rule in rules:
+        left, right = rule.split("->")
+        left = left.strip()
+        right_options = [opt.strip() for opt in right.split("|")]
+        P[left] = right_options
+    return Grammar(VT_list, VN_list, P, S)
+
+
+def derivation_history(grammar: Grammar, history: Dict[str, str], chain: str, leftmost: bool = True) -> List[str]:
+    # Вывод цепочки в исходной грамматике (от начального символа до цепочки) по ссылкам
+    # на родителей, собранным iter_chains с тем же leftmost. Ссылки ведут по формам
+    # грамматики без ε-правил и цепных правил: по ним собирается дерево вывода,
+    # которое переводится в дерево исходной грамматики.
+    normalized, compiled = _enumeration_grammar(grammar)
+    forms = [chain]
+    while forms[-1] in history:
+        forms.append(history[forms[-1]])
+    forms.reverse()
+    start = compiled.names[compiled.start]
+    if forms[0] != start:
+        raise ValueError(f"Цепочки '{chain}' нет в истории вывода")
+    nonterminals = set(compiled.names[:compiled.nonterminal_count])
+    root = TreeNode(start)
+    leaves = [root]  # Листья дерева - символы текущей формы
+    for form in forms[1:]:
+        symbols = tokenize(form, compiled.names)
+        positions = [i for i, leaf in enumerate(leaves) if leaf.symbol in nonterminals]
+        index = positions[0] if leftmost else positions[-1]
+        node = leaves[index]
+        node.children = [TreeNode(symbol) for symbol in symbols[index:index + len(symbols) - len(leaves) + 1]]
+        leaves[index:index + 1] = node.children
+    tree = normalized.restore_tree(root)
+    return [form for form, _, _ in _derivation_steps(tree, _compile(grammar), leftmost)] + [chain]
+
+
+def _compile(grammar) -> CompiledGrammar:
+    # Подсчёт и разбор идут по приведённой грамматике: бесполезные
+    # нетерминалы и их правила не попадают в поиск
+    if isinstance(grammar, CompiledGrammar):
+        return grammar
+    return CompiledGrammar(reduce_grammar(grammar).grammar)
+
+
+def _enumeration_grammar(grammar: Grammar) -> Tuple[Normalized, CompiledGrammar]:
+    # Перебор идёт по приведённой грамматике без ε-правил и цепных правил: иначе формы
+    # вроде AAA...A при A -> AA | ε растут бесконечно, не приближаясь к терминальной
+    # цепочке. Пустая цепочка остаётся только правилом S -> ε, и S не встречается
+    # в правых частях. Деревья этой грамматики переводятся в исходную через restore_tree.
+    normalized = normalize(grammar, "epsilon_free")
+    return normalized, CompiledGrammar(normalized.grammar)
+
+
+def _weighted_rules(grammar: CompiledGrammar):
+    # Формы хранятся упакованными строками (CompiledGrammar.pack): символ с кодом,
+    # не меньшим boundary, - терминал
+    nt = grammar.nonterminal_count
+    boundary = chr(nt)
+    # В грамматике без ε-правил каждый нетерминал даёт хотя бы один символ
+    yields = {chr(symbol): max(value, 1) for symbol, value in enumerate(grammar.min_yield)}
+
+    def weight(form):
+        # Число терминалов плюс обязательный вклад нетерминалов
+        total = 0
+        for c in form:
+            total += yields[c]
+        return total
+
+    # Правило S -> ε не участвует в переборе: пустая цепочка обрабатывается
+    # отдельно (флаг empty). Вес альтернативы и число нетерминалов в ней считаются один раз.
+    rules = {}
+    for left, options in enumerate(grammar.productions):
+        packed = [grammar.pack(option) for option in options if option]
+        rules[chr(left)] = [(option, weight(option), sum(c < boundary for c in option)) for option in packed]
+    empty = grammar.nullable[grammar.start]
+    return boundary, yields, rules, weight, empty
+
+
+def _iter_discovery(grammar: CompiledGrammar, min_len: int, max_len: int, leftmost: bool,
+                    history: Optional[Dict[str, str]], max_forms: Optional[int] = None) -> Iterator[str]:
+    # Отдаёт упакованные цепочки; history заполняется записанными именами формами.
+    # CountLimitExceeded, если найдено больше max_forms различных форм
+    boundary, yields, rules, weight, empty = _weighted_rules(grammar)
+    spell = grammar.spell
+
+    start = chr(grammar.start)
+    if empty and min_len <= 0 <= max_len:
+        if history is not None:
+            history[""] = spell(start)
+        yield ""
+    start_weight = weight(start)
+    if start_weight > max_len:
+        return
+    visited = {start}
+    # (форма, нижняя граница длины, число нетерминалов, позиция начала поиска нетерминала)
+    queue = deque([(start, start_weight, 1, 0)])
+
+    while queue:
+        current, bound, nonterminals, index = queue.popleft()
+
+        # Ищем самый левый (или самый правый) нетерминал, начиная с места прошлой замены
+        if leftmost:
+            while current[index] >= boundary:
+                index += 1
+        else:
+            while current[index] >= boundary:
+                index -= 1
+
+        symbol = current[index]
+        rest = bound - yields[symbol]
+        for replacement, replacement_weight, replacement_nonterminals in rules[symbol]:
+            # Отсекаем форму, если даже минимальный вывод длиннее max_len
+            if rest + replacement_weight > max_len:
+                continue
+            new_chain = current[:index] + replacement + current[index + 1:]
+            if new_chain in visited:
+                continue
+            visited.add(new_chain)
+            if max_forms is not None and len(visited) > max_forms:
+                raise CountLimitExceeded(f"Перебор прошёл больше {max_forms} форм")
+            if history is not None:
+                history[spell(new_chain)] = spell(current)
+            new_bound = rest + replacement_weight
+            new_nonterminals = nonterminals - 1 + replacement_nonterminals
+            # Цепочка из одних терминалов отдаётся сразу, как только найдена
+            if not new_nonterminals:
+                if min_len <= new_bound:
+                    yield new_chain
+                continue
+            next_index = index if leftmost else index + len(replacement) - 1
+            queue.append((new_chain, new_bound, new_nonterminals, next_index))
+
+
+def _iter_shortlex(grammar: CompiledGrammar, min_len: int, max_len: int) -> Iterator[str]:
+    boundary, yields, rules, weight, empty = _weighted_rules(grammar)
+
+    def split(form, index):
+        # Переносит ведущие терминалы формы в её префикс
+        while index < len(form) and form[index] >= boundary:
+            index += 1
+        return index
+
+    start = chr(grammar.start)
+    start_weight = weight(start)
+    for length in range(max(min_len, 0), max_len + 1):
+        if length == 0 and empty:
+            yield ""
+        if start_weight > length:
+            continue
+        # Куча упорядочена по терминальному префиксу: все цепочки, выводимые из формы,
+        # начинаются с её префикса, поэтому готовые цепочки извлекаются по возрастанию.
+        # При равных префиксах готовая цепочка идёт раньше незавершённых форм.
+        heap = [("", True, start, start_weight, 0)]
+        visited = {start}
+        last = None
+        while heap:
+            prefix, pending, current, bound, index = heapq.heappop(heap)
+            if not pending:
+                # Одинаковые цепочки при таком порядке идут подряд
+                if len(current) == length and current != last:
+                    last = current
+                    yield current
+                continue
+
+            symbol = current[index]
+            rest = bound - yields[symbol]
+            for replacement, replacement_weight, _ in rules[symbol]:
+                if rest + replacement_weight > length:
+                    continue
+                new_chain = current[:index] + replacement + current[index + 1:]
+                if new_chain in visited:
+                    continue
+                visited.add(new_chain)
+                new_index = split(new_chain, index)
+                heapq.heappush(heap, (new_chain[:new_index], new_index < len(new_chain),
+                                      new_chain, rest + replacement_weight, new_index))
+
+
+def iter_chains(grammar: Grammar, min_len: int, max_len: int, order: str = "discovery",
+                limit: Optional[int] = None, leftmost: bool = True,
+                history: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    # Ленивая генерация цепочек языка длиной от min_len до max_len (длина - число
+    # терминальных символов). order="discovery" отдаёт цепочки в порядке обнаружения
+    # (поиск в ширину), order="shortlex" - по возрастанию длины, а при равной длине
+    # лексикографически. history заполняется ссылками на родительские формы
+    # (только для "discovery"), вывод цепочки по ним восстанавливает derivation_history.
+    _, compiled = _enumeration_grammar(grammar)
+    if order == "discovery":
+        # Множество выводимых цепочек не зависит от порядка замен, поэтому без записи
+        # истории всегда раскрываем левый нетерминал: так форм меньше всего
+        chains = _iter_discovery(compiled, min_len, max_len, leftmost or history is None, history)
+    elif order == "shortlex":
+        chains = _iter_shortlex(compiled, min_len, max_len)
+    else:
+        raise ValueError(f"Неизвестный порядок генерации: {order}")
+    chains = map(compiled.spell, chains)
+    if limit is not None:
+        chains = islice(chains, limit)
+    return chains
+
+
+def generate_chains(grammar: Grammar, min_len: int, max_len: int, leftmost: bool,
+                    history: Optional[Dict[str, str]] = None) -> List[str]:
+    return sorted(iter_chains(grammar, min_len, max_len, leftmost=leftmost, history=history))
+
+
+def count_chains(grammar: Grammar, max_len: int, derivations: bool = False,
+                 limit: Optional[int] = COUNT_ENUMERATION_LIMIT) -> List[int]:
+    # Число цепочек языка каждой длины от 0 до max_len (длина - индекс в списке).
+    # derivations=True считает деревья вывода (левосторонние выводы), а не различные
+    # цепочки. Для однозначной грамматики эти числа совпадают, и подсчёт полиномиален
+    # по max_len. Если однозначность не удаётся доказать (грамматика не LL(1)),
+    # различные цепочки считаются перебором, время которого растёт с max_len
+    # экспоненциально; CountLimitExceeded, если перебор проходит больше limit форм
+    # (None - без ограничения).
+    compiled = _compile(grammar)
+    counts = [0] * (max_len + 1)
+    if max_len < 0 or not compiled.useful:
+        return counts[:max(max_len + 1, 0)]
+    if not derivations and not compiled.is_ll1():
+        _, enumerated = _enumeration_grammar(grammar)
+        try:
+            for chain in _iter_discovery(enumerated, 0, max_len, True, None, limit):
+                counts[len(chain)] += 1
+        except CountLimitExceeded:
+            raise CountLimitExceeded(f"Грамматика не LL(1), поэтому цепочки считаются перебором, а для длины "
+                                     f"до {max_len} он проходит больше {limit} форм. Уменьшите максимальную "
+                                     f"длину.") from None
+        return counts
+
+    # Узлы вычисления: нетерминалы и суффиксы правых частей правил. Для каждого узла
+    # table[узел][k] - число деревьев вывода с кроной длины k. Узел зависит от другого
+    # узла той же длины k, если остальная часть разбиения может быть пустой; такие
+    # зависимости упорядочиваются топологически, а цикл в них означает бесконечное
+    # число деревьев вывода.
+    nt = compiled.nonterminal_count
+    nullable = compiled.nullable
+    end = ("end",)
+    terminal = [0] * (max_len + 1)
+    if max_len >= 1:
+        terminal[1] = 1
+    table = {end: [1] + [0] * max_len}
+    parts = {}
+    depends = {left: [] for left in compiled.useful}
+    for rule in compiled.useful_rules:
+        left, option = compiled.rule_lhs[rule], compiled.rule_rhs[rule]
+        for i in range(len(option) - 1, -1, -1):
+            node = (rule, i)
+            tail = (rule, i + 1) if i + 1 < len(option) else end
+            head = option[i]
+            parts[node] = (head if head < nt else None, tail)
+            depends[node] = []
+            if head < nt and all(nullable[c] for c in option[i + 1:]):
+                depends[node].append(head)
+            if nullable[head] and tail is not end:
+                depends[node].append(tail)
+        depends[left].append((rule, 0) if option else end)
+
+    order = []
+    state = {}
+    for root in depends:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(depends[root]))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                order.append(node)
+                stack.pop()
+            elif state.get(child) == 1:
+                raise ValueError("Грамматика циклична: число деревьев вывода бесконечно")
+            elif child not in state and child is not end:
+                state[child] = 1
+                stack.append((child, iter(depends[child])))
+
+    for node in order:
+        table[node] = [0] * (max_len + 1)
+    for k in range(max_len + 1):
+        for node in order:  # зависимости внутри одной длины вычисляются раньше
+            if node in parts:
+                head, tail = parts[node]
+                head = table[head] if head is not None else terminal
+                tail = table[tail]
+                table[node][k] = sum(head[l] * tail[k - l] for l in range(k + 1))
+            else:
+                table[node][k] = sum(table[option][k] for option in depends[node])
+    return table[compiled.start]
+
+
+def build_parse_tree(chain: str, grammar: Grammar, leftmost: bool) -> List[Tuple[str, str, str]]:
+    # Последовательность шагов вывода (форма, нетерминал, замена), восстановленная
+    # по дереву разбора алгоритмом Эрли
+    compiled = _compile(grammar)
+    tree_root, _ = parse(compiled, chain)
+    if tree_root is None:
+        raise ValueError(f"Цепочка '{chain}' не выводится в грамматике")
+    return list(_derivation_steps(tree_root, compiled, leftmost))
+
+
+def _derivation_steps(tree: TreeNode, compiled: CompiledGrammar, leftmost: bool) -> Iterator[Tuple[str, str, str]]:
+    separator = compiled.form_separator
+    nonterminals = set(compiled.names[:compiled.nonterminal_count])
+    current = [tree.symbol]
+    for done, symbol, replacement in iter_derivation(tree, nonterminals, leftmost):
+        index = done if leftmost else len(current) - 1 - done
+        yield separator.join(current), symbol, separator.join(replacement)
+        current[index:index + 1] = replacement
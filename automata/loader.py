@@ -0,0 +1,223 @@
+import gc
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+from .dfa import CompiledDFA
+from .dpda import EPS, CompiledDPDA, Rule, push_symbols
+from .npda import NPDA
+from .transducer import Transducer
+
+CACHE_VERSION = 3  # Меняется, когда меняется устройство скомпилированных автоматов
+# Заголовок снимка: метка, версия, SHA-256 JSON-файла, HMAC-SHA256 заголовка и данных;
+# дальше - pickle с LoadedMachine
+CACHE_HEADER = struct.Struct("<8sI32s32s")
+CACHE_MAGIC = b"AUTOMATA"
+CACHE_KEY_FILE = "key"  # Секретный ключ пользователя для подписи снимков
+CACHE_KEY_SIZE = 32
+
+
+def cache_directory() -> str:
+    # Каталог снимков пользователя: AUTOMATA_CACHE_DIR или ~/.cache/automata (XDG_CACHE_HOME)
+    directory = os.environ.get("AUTOMATA_CACHE_DIR")
+    if not directory:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        directory = os.path.join(base, "automata")
+    return directory
+
+
+def _cache_key(directory: str) -> bytes:
+    # Ключ создаётся при первом обращении и доступен только владельцу
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    path = os.path.join(directory, CACHE_KEY_FILE)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            key = f.read()
+        if len(key) != CACHE_KEY_SIZE:
+            raise OSError(f"Ключ снимков {path} повреждён")
+        return key
+    key = os.urandom(CACHE_KEY_SIZE)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _signature(key: bytes, digest: bytes, payload: bytes) -> bytes:
+    return hmac.new(key, CACHE_MAGIC + struct.pack("<I", CACHE_VERSION) + digest + payload, hashlib.sha256).digest()
+
+
+@dataclass
+class MachineSpec:
+    # Проверенное описание автомата из JSON-файла: ДКА (lab2), ДМПА (lab3)
+    # или МП-преобразователь (lab4). В правилах пустая цепочка всегда записана как ε.
+    kind: str  # "dfa", "dpda" или "transducer"
+    states: List[str]
+    alphabet: List[str]
+    start: str
+    end: List[str]
+    transitions: Dict[str, Dict[str, str]] = field(default_factory=dict)  # Только у ДКА
+    rules: List[Rule] = field(default_factory=list)  # У МП-автоматов
+    stack_alphabet: Optional[List[str]] = None
+    output_alphabet: Optional[List[str]] = None
+    start_stack: str = ""
+
+
+@dataclass
+class LoadedMachine:
+    spec: MachineSpec
+    # Автомат для проверки цепочек: CompiledDFA, CompiledDPDA, Transducer
+    # или NPDA, если правила недетерминированы или зацикливаются на ε-правилах
+    # (тогда причина - в nondeterministic)
+    compiled: Union[CompiledDFA, CompiledDPDA, NPDA]
+    digest: str  # SHA-256 содержимого файла
+    nondeterministic: Optional[str] = None
+
+
+def load_machine(filename: str, cache: bool = True, cache_dir: Optional[str] = None) -> LoadedMachine:
+    # Загрузка автомата из JSON-файла с проверкой и компиляцией. Результат сохраняется
+    # в каталоге снимков пользователя (cache_dir, по умолчанию cache_directory())
+    # под именем по хешу содержимого; пока файл не изменился, повторная загрузка только
+    # читает этот снимок. Снимок подписан HMAC с ключом, который лежит в том же каталоге
+    # и известен только пользователю, и распаковывается только после проверки подписи:
+    # подложенный файл чужого снимка не выполняет код при чтении.
+    # Ошибки: OSError - файл не прочитан, ValueError - описание автомата неверно.
+    with open(filename, "rb") as json_file:
+        raw = json_file.read()
+    digest = hashlib.sha256(raw)
+    key = cache_file = None
+    if cache:
+        directory = cache_directory() if cache_dir is None else cache_dir
+        cache_file = os.path.join(directory, digest.hexdigest() + ".pickle")
+        try:
+            key = _cache_key(directory)
+            with open(cache_file, "rb") as f:
+                magic, version, stored_digest, signature = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+                payload = f.read()
+            if (magic, version, stored_digest) == (CACHE_MAGIC, CACHE_VERSION, digest.digest()) and \
+                    hmac.compare_digest(signature, _signature(key, stored_digest, payload)):
+                # Сборщик мусора на время чтения выключен: снимок - сотни тысяч мелких
+                # объектов, и без этого их обход занимает больше, чем само чтение
+                enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    return pickle.loads(payload)
+                finally:
+                    if enabled:
+                        gc.enable()
+        except (OSError, struct.error, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError):
+            pass
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Файл {filename} не является JSON: {e}")
+    loaded = compile_machine(parse_machine(data), digest.hexdigest())
+    if key is not None:
+        payload = pickle.dumps(loaded, pickle.HIGHEST_PROTOCOL)
+        try:
+            # Снимок пишется во временный файл и переименовывается, чтобы параллельная
+            # загрузка не прочитала его недописанным
+            temporary = f"{cache_file}.{os.getpid()}"
+            with open(temporary, "wb") as f:
+                f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, digest.digest(),
+                                          _signature(key, digest.digest(), payload)))
+                f.write(payload)
+            os.replace(temporary, cache_file)
+        except OSError:
+            pass  # Каталог снимков недоступен - обходимся без снимка
+    return loaded
+
+
+def parse_machine(data: dict) -> MachineSpec:
+    # Проверка описания автомата; ValueError называет первое найденное нарушение
+    if not isinstance(data, dict):
+        raise ValueError("Описание автомата должно быть JSON-объектом")
+    if "Func" in data:
+        _require(data, "states", "alphabet", "Func", "start", "ends")
+        kind = "dfa"
+    else:
+        _require(data, "states", "alphabet", "rules", "start", "start_stack", "end")
+        kind = "transducer" if any(isinstance(rule, list) and len(rule) > 5 for rule in data["rules"]) else "dpda"
+    states = _strings(data, "states")
+    alphabet = _strings(data, "alphabet")
+    state_set = set(states)
+    symbol_set = set(alphabet)
+    start = data["start"]
+    if start not in state_set:
+        raise ValueError(f"Начальное состояние {start!r} не входит в states")
+    end = data["ends" if kind == "dfa" else "end"]
+    end = [end] if isinstance(end, str) else end
+    if not isinstance(end, list) or any(state not in state_set for state in end):
+        raise ValueError(f"Заключительные состояния {end!r} должны входить в states")
+
+    if kind == "dfa":
+        func = data["Func"]
+        if not isinstance(func, dict):
+            raise ValueError("Func должен быть объектом {состояние: {символ: состояние}}")
+        for state, row in func.items():
+            if state not in state_set or not isinstance(row, dict):
+                raise ValueError(f"Func: строка {state!r} - не состояние автомата")
+            for symbol, target in row.items():
+                if symbol not in symbol_set or target not in state_set:
+                    raise ValueError(f"Func: переход ({state}, {symbol!r}) -> {target!r} вне states/alphabet")
+        return MachineSpec(kind, states, alphabet, start, end, transitions=func)
+
+    stack_alphabet = _strings(data, "in_stack") if "in_stack" in data else None
+    output_alphabet = _strings(data, "in_transform") if "in_transform" in data else None
+    stack_set = None if stack_alphabet is None else set(stack_alphabet)
+    output_set = None if output_alphabet is None else set(output_alphabet)
+    start_stack = data["start_stack"]
+    if not isinstance(start_stack, str) or stack_set is not None and not set(push_symbols(start_stack)) <= stack_set:
+        raise ValueError(f"Начальное содержимое стека {start_stack!r} не из символов in_stack")
+    arity = 6 if kind == "transducer" else 5
+    rules = []
+    for rule in data["rules"]:
+        if not isinstance(rule, list) or len(rule) != arity or not all(isinstance(item, str) for item in rule):
+            raise ValueError(f"Правило {rule!r}: нужно {arity} строк")
+        # Пустая цепочка приводится к одному обозначению один раз, при загрузке
+        rule = [EPS[0] if i in (1, 4, 5) and item in EPS else item for i, item in enumerate(rule)]
+        if rule[0] not in state_set or rule[3] not in state_set:
+            raise ValueError(f"Правило {rule!r}: состояние не входит в states")
+        if rule[1] != EPS[0] and rule[1] not in symbol_set:
+            raise ValueError(f"Правило {rule!r}: символ {rule[1]!r} не входит в alphabet")
+        if stack_set is not None and (rule[2] not in stack_set or not set(push_symbols(rule[4])) <= stack_set):
+            raise ValueError(f"Правило {rule!r}: символы стека не входят в in_stack")
+        if output_set is not None and rule[5] != EPS[0] and not set(rule[5]) <= output_set:
+            raise ValueError(f"Правило {rule!r}: выход не из символов in_transform")
+        rules.append(rule)
+    return MachineSpec(kind, states, alphabet, start, end, rules=rules, stack_alphabet=stack_alphabet,
+                       output_alphabet=output_alphabet, start_stack=start_stack)
+
+
+def compile_machine(spec: MachineSpec, digest: str = "") -> LoadedMachine:
+    if spec.kind == "dfa":
+        return LoadedMachine(spec, CompiledDFA(spec.states, spec.alphabet, spec.transitions, spec.start, spec.end),
+                             digest)
+    args = (spec.states, spec.alphabet, spec.rules, spec.start, spec.start_stack, spec.end)
+    try:
+        compiled = Transducer(*args) if spec.kind == "transducer" else CompiledDPDA(*args)
+    except ValueError as e:
+        # Правила с выбором или ε-циклом: цепочки проверяются перебором конфигураций
+        return LoadedMachine(spec, NPDA(*args), digest, str(e))
+    return LoadedMachine(spec, compiled, digest)
+
+
+def _require(data: dict, *names: str):
+    missing = [name for name in names if name not in data]
+    if missing:
+        raise ValueError(f"В описании автомата нет полей: {', '.join(missing)}")
+
+
+def _strings(data: dict, name: str) -> List[str]:
+    values = data[name]
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"{name} должен быть списком строк")
+    if len(set(values)) != len(values):
+        raise ValueError(f"В {name} есть повторы")
+    return values
@@ -0,0 +1,275 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from .compiled_grammar import CompiledGrammar, tokenize
+from .earley import TreeNode
+
+# Шаблон восстановления правила - список элементов, из которых собираются узлы
+# дерева исходной грамматики: число i - поддерево(я), восстановленные из i-го символа
+# правой части нового правила, а ("node", символ, элементы) - узел исходной грамматики.
+# Вспомогательные нетерминалы (новый начальный символ, хвосты длинных правил,
+# обёртки терминалов) «прозрачны»: их шаблон не создаёт узла, и потомки
+# вклеиваются в родителя.
+
+
+class Normalized:
+    # Результат преобразования: эквивалентная грамматика и этапы, по которым дерево
+    # вывода в ней переводится обратно в дерево исходной грамматики
+    def __init__(self, grammar, stages: Optional[list] = None):
+        self.grammar = grammar
+        # Этапы в порядке применения: (шаблоны правил, нетерминалы грамматики этапа)
+        self._stages: List[Tuple[Dict[Tuple[str, Tuple[str, ...]], list], Set[str]]] = stages or []
+
+    def then(self, step) -> "Normalized":
+        # Применяет следующее преобразование к полученной грамматике
+        result = step(self.grammar)
+        return Normalized(result.grammar, self._stages + result._stages)
+
+    def restore_tree(self, tree: TreeNode) -> TreeNode:
+        for templates, nonterminals in reversed(self._stages):
+            tree = _restore_stage(tree, templates, nonterminals)
+        return tree
+
+
+def _rules(grammar) -> List[Tuple[str, Tuple[str, ...]]]:
+    vocabulary = set(grammar.VT) | set(grammar.VN)
+    return [(left, tuple(tokenize(option, vocabulary)))
+            for left, options in grammar.P.items() if left in set(grammar.VN)
+            for option in options]
+
+
+def _make_grammar(original, terminals, nonterminals, rules, start):
+    # Грамматика того же класса, что и исходная. Если среди имён есть многосимвольные,
+    # символы правых частей разделяются пробелами.
+    names = list(terminals) + list(nonterminals)
+    separator = "" if all(len(name) == 1 for name in names) else " "
+    P: Dict[str, List[str]] = {left: [] for left in nonterminals}
+    for left, rhs in rules:
+        option = separator.join(rhs)
+        if option not in P[left]:
+            P[left].append(option)
+    return type(original)(list(terminals), list(nonterminals), P, start)
+
+
+def _fresh(base: str, used: Set[str]) -> str:
+    name = base
+    index = 0
+    while name in used:
+        index += 1
+        name = f"{base}{index}"
+    used.add(name)
+    return name
+
+
+def _instantiate(template, children) -> List[TreeNode]:
+    result = []
+    for item in template:
+        if isinstance(item, int):
+            result.extend(children[item])
+        else:
+            _, symbol, items = item
+            node = TreeNode(symbol)
+            node.children = _instantiate(items, children)
+            result.append(node)
+    return result
+
+
+def _restore_stage(tree: TreeNode, templates, nonterminals) -> TreeNode:
+    # Обратный обход: поддеревья потомков восстанавливаются раньше родителя
+    restored: Dict[int, List[TreeNode]] = {}
+    stack = [(tree, False)]
+    while stack:
+        node, ready = stack.pop()
+        if node.symbol not in nonterminals:
+            restored[id(node)] = [TreeNode(node.symbol)]
+            continue
+        if not ready:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children)
+            continue
+        rhs = tuple(child.symbol for child in node.children)
+        template = templates[(node.symbol, rhs)]
+        restored[id(node)] = _instantiate(template, [restored.pop(id(child)) for child in node.children])
+    return restored[id(tree)][0]
+
+
+def reduce_grammar(grammar) -> Normalized:
+    # Удаляет непродуктивные и недостижимые нетерминалы вместе с их правилами.
+    # Деревья вывода не меняются, поэтому восстанавливать нечего.
+    compiled = CompiledGrammar(grammar)
+    names = compiled.names
+    rules = [(names[compiled.rule_lhs[rule]], tuple(names[c] for c in compiled.rule_rhs[rule]))
+             for rule in compiled.useful_rules]
+    nonterminals = [symbol for symbol in grammar.VN if compiled.ids[symbol] in compiled.useful]
+    if not nonterminals:
+        nonterminals = [grammar.S]  # пустой язык: остаётся начальный символ без правил
+    used_terminals = {c for _, rhs in rules for c in rhs}
+    terminals = [symbol for symbol in grammar.VT if symbol in used_terminals]
+    return Normalized(_make_grammar(grammar, terminals, nonterminals, rules, grammar.S))
+
+
+def _empty_trees(rules, nullable) -> Dict[str, tuple]:
+    # Для каждого аннулируемого нетерминала - шаблон узла его ε-вывода. Правило
+    # выбирается, когда все символы его правой части уже получили шаблон, поэтому
+    # циклов (A -> B, B -> A) в шаблонах нет.
+    trees: Dict[str, tuple] = {}
+    changed = True
+    while changed:
+        changed = False
+        for left, rhs in rules:
+            if left in nullable and left not in trees and all(c in trees for c in rhs):
+                trees[left] = ("node", left, [trees[c] for c in rhs])
+                changed = True
+    return trees
+
+
+def remove_epsilon(grammar) -> Normalized:
+    # Грамматика без ε-правил. Если язык содержит пустую цепочку, остаётся
+    # единственное правило S -> ε, а S не встречается в правых частях
+    # (при необходимости вводится новый начальный символ).
+    rules = _rules(grammar)
+    nonterminals = set(grammar.VN)
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for left, rhs in rules:
+            if left not in nullable and all(c in nullable for c in rhs):
+                nullable.add(left)
+                changed = True
+    empty_trees = _empty_trees(rules, nullable)
+
+    templates: Dict[Tuple[str, Tuple[str, ...]], list] = {}
+    new_rules = []
+
+    def add(left, rhs, template):
+        if (left, rhs) not in templates:
+            templates[(left, rhs)] = template
+            new_rules.append((left, rhs))
+
+    for left, rhs in rules:
+        # Все способы вычеркнуть аннулируемые символы правой части
+        variants = [((), [])]
+        for c in rhs:
+            extended = []
+            for kept, items in variants:
+                extended.append((kept + (c,), items + [len(kept)]))
+                if c in nullable:
+                    extended.append((kept, items + [empty_trees[c]]))
+            variants = extended
+        for kept, items in variants:
+            if kept and kept != (left,):
+                add(left, kept, [("node", left, items)])
+
+    start = grammar.S
+    new_nonterminals = [symbol for symbol in grammar.VN]
+    if start in nullable:
+        if any(start in rhs for _, rhs in new_rules):
+            used = set(grammar.VT) | nonterminals
+            start = _fresh(grammar.S + "0", used)
+            new_nonterminals.insert(0, start)
+            nonterminals = nonterminals | {start}
+            add(start, (grammar.S,), [0])
+        add(start, (), [empty_trees[grammar.S]])
+    result = _make_grammar(grammar, grammar.VT, new_nonterminals, new_rules, start)
+    return Normalized(result, [(templates, nonterminals)])
+
+
+def remove_unit_rules(grammar) -> Normalized:
+    # Заменяет цепные правила A -> B правилами A -> α для всех нецепных B -> α,
+    # где A =>* B по цепным правилам. Шаблон воспроизводит пропущенную цепочку узлов.
+    rules = _rules(grammar)
+    nonterminals = set(grammar.VN)
+    units: Dict[str, List[str]] = {}
+    proper: Dict[str, List[Tuple[str, ...]]] = {}
+    for left, rhs in rules:
+        if len(rhs) == 1 and rhs[0] in nonterminals:
+            units.setdefault(left, []).append(rhs[0])
+        else:
+            proper.setdefault(left, []).append(rhs)
+
+    templates: Dict[Tuple[str, Tuple[str, ...]], list] = {}
+    new_rules = []
+    for left in grammar.VN:
+        # Поиск в ширину по цепным правилам: для каждого B - кратчайшая цепочка A => ... => B
+        paths = {left: [left]}
+        queue = [left]
+        for symbol in queue:
+            for target in units.get(symbol, ()):
+                if target not in paths:
+                    paths[target] = paths[symbol] + [target]
+                    queue.append(target)
+        for symbol in queue:
+            for rhs in proper.get(symbol, ()):
+                if (left, rhs) in templates:
+                    continue
+                items = list(range(len(rhs)))
+                for node in reversed(paths[symbol]):
+                    items = [("node", node, items)]
+                templates[(left, rhs)] = items
+                new_rules.append((left, rhs))
+    result = _make_grammar(grammar, grammar.VT, grammar.VN, new_rules, grammar.S)
+    return Normalized(result, [(templates, nonterminals)])
+
+
+def to_cnf(grammar) -> Normalized:
+    # Нормальная форма Хомского: A -> BC, A -> a и, для пустой цепочки, S -> ε.
+    # Ожидает грамматику без ε-правил (кроме S -> ε) и цепных правил.
+    rules = _rules(grammar)
+    nonterminals = set(grammar.VN)
+    used = set(grammar.VT) | nonterminals
+    new_nonterminals = list(grammar.VN)
+    templates: Dict[Tuple[str, Tuple[str, ...]], list] = {}
+    new_rules = []
+    wrappers: Dict[str, str] = {}
+    tails: Dict[Tuple[str, ...], str] = {}
+
+    def add(left, rhs, template):
+        if (left, rhs) not in templates:
+            templates[(left, rhs)] = template
+            new_rules.append((left, rhs))
+
+    def wrap(symbol):
+        # Терминал внутри длинного правила заменяется обёрткой <a> -> a
+        if symbol in nonterminals:
+            return symbol
+        if symbol not in wrappers:
+            wrappers[symbol] = _fresh(f"<{symbol}>", used)
+            new_nonterminals.append(wrappers[symbol])
+            add(wrappers[symbol], (symbol,), [0])
+        return wrappers[symbol]
+
+    def tail(symbols):
+        # Хвост X2 ... Xn длинного правила выводится отдельным нетерминалом,
+        # общим для всех правил с таким хвостом
+        if len(symbols) == 1:
+            return symbols[0]
+        if symbols not in tails:
+            tails[symbols] = _fresh(symbols[0] + "'", used)
+            new_nonterminals.append(tails[symbols])
+            add(tails[symbols], (symbols[0], tail(symbols[1:])), [0, 1])
+        return tails[symbols]
+
+    for left, rhs in rules:
+        if len(rhs) <= 1:
+            add(left, rhs, [("node", left, list(range(len(rhs))))])
+            continue
+        symbols = tuple(wrap(c) for c in rhs)
+        add(left, (symbols[0], tail(symbols[1:])), [("node", left, [0, 1])])
+    nonterminals = set(new_nonterminals)
+    result = _make_grammar(grammar, grammar.VT, new_nonterminals, new_rules, grammar.S)
+    return Normalized(result, [(templates, nonterminals)])
+
+
+def normalize(grammar, form: str = "cnf") -> Normalized:
+    # form: "reduced" - без бесполезных символов, "epsilon_free" - кроме того без ε-правил
+    # и цепных правил, "cnf" - нормальная форма Хомского
+    forms = ("reduced", "epsilon_free", "cnf")
+    if form not in forms:
+        raise ValueError(f"Неизвестная форма грамматики: {form}")
+    result = reduce_grammar(grammar)
+    if form == "reduced":
+        return result
+    result = result.then(remove_epsilon).then(remove_unit_rules).then(reduce_grammar)
+    if form == "cnf":
+        result = result.then(to_cnf)
+    return result
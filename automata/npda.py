@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .dpda import EPS, Rule, push_symbols
+
+
+@dataclass
+class NPDAResult:
+    accepted: bool
+    position: int  # Наибольшее число символов, прочитанное хотя бы одной ветвью
+    configurations: int  # Число различных просмотренных ситуаций
+    rules: Optional[List[Rule]] = None  # Правила принимающего пути (если он запрошен)
+    output: Optional[str] = None  # Перевод вдоль принимающего пути (у МП-преобразователя)
+
+
+class NPDA:
+    # Недетерминированный МП-автомат (и МП-преобразователь, если у правил есть шестое поле).
+    # Полные стеки ветвей не хранятся. Вычисление делится на фрагменты: фрагмент
+    # (i, p, X) начинается в позиции i в состоянии p с символом X наверху и кончается,
+    # когда X и всё записанное вместо него снято со стека. Что лежит ниже X, на фрагмент
+    # не влияет, поэтому его концы (j, q) вычисляются один раз для всех ветвей,
+    # которые до него дошли (граф-структурированный стек). Ситуация - (позиция,
+    # фрагмент, состояние, ещё не снятые символы фрагмента), и их число полиномиально
+    # по длине цепочки, как у ситуаций алгоритма Эрли, даже если ветвей экспоненциально
+    # много. Конечно и ε-замыкание: ε-правило, кладущее символы бесконечно, только
+    # повторно вызывает уже начатый фрагмент.
+    # Цепочка принимается, если после её чтения достижима конфигурация
+    # с пустым стеком и заключительным состоянием.
+    def __init__(self, states: Iterable[str], alphabet: Iterable[str], rules: Iterable[Rule],
+                 start: str, start_stack: str, end):
+        self.states: List[str] = list(states)
+        self.alphabet: List[str] = list(alphabet)
+        self.start = start
+        self.start_stack = start_stack
+        self.end = set(end) if isinstance(end, (list, tuple, set)) else {end}
+        # Символы, записываемые правилом, хранятся верхним первым: в этом порядке их снимают
+        self.moves: Dict[Tuple[str, str, str], List[tuple]] = {}
+        self.epsilon_moves: Dict[Tuple[str, str], List[tuple]] = {}
+        for rule in rules:
+            move = (rule[3], tuple(reversed(push_symbols(rule[4]))), rule)
+            if rule[1] in EPS:
+                self.epsilon_moves.setdefault((rule[0], rule[2]), []).append(move)
+            else:
+                self.moves.setdefault((rule[0], rule[1], rule[2]), []).append(move)
+
+    @classmethod
+    def from_machine(cls, machine) -> "NPDA":
+        # Автомат из lab3.Machine или lab4.Machine
+        return cls(machine.Q, machine.V, machine.Rules, machine.Start_state, machine.Start_stack, machine.End)
+
+    def run(self, word, path: bool = False) -> NPDAResult:
+        # path=True - восстановить правила принимающего пути; перевод восстанавливается
+        # вместе с ним. Для этого у каждой ситуации хранится, как она получена.
+        word = list(word)
+        alphabet = set(self.alphabet)
+        moves, epsilon_moves = self.moves, self.epsilon_moves
+
+        # Ситуация - (позиция, фрагмент, состояние, неснятые символы фрагмента верхним первым).
+        # Фрагмент None - весь проход от начального стека.
+        # back[ситуация] - None у начальной, (None, правило), с которого начат фрагмент,
+        # или (ситуация до вызова фрагмента, завершённая ситуация вызванного фрагмента)
+        back: Dict[tuple, object] = {}
+        layers: List[List[tuple]] = [[] for _ in range(len(word) + 1)]
+        waiting: Dict[tuple, List[tuple]] = {}  # фрагмент -> ситуации, ждущие его конца
+        ends: Dict[tuple, List[tuple]] = {}  # фрагмент -> его завершённые ситуации
+
+        def add(item, how):
+            if item not in back:
+                back[item] = how
+                layers[item[0]].append(item)
+
+        add((0, None, self.start, tuple(reversed(push_symbols(self.start_stack)))), None)
+        position = 0
+        for j, layer in enumerate(layers):
+            if not layer:
+                break
+            position = j
+            symbol = word[j] if j < len(word) and word[j] in alphabet else None
+            for item in layer:  # список растёт, пока в позиции j находятся новые ситуации
+                _, fragment, state, rest = item
+                if not rest:
+                    if fragment is None:
+                        continue
+                    # Фрагмент закончился: продолжаем все ситуации, которые его вызвали
+                    ends.setdefault(fragment, []).append(item)
+                    for caller in waiting[fragment]:
+                        add((j, caller[1], state, caller[3][1:]), (caller, item))
+                    continue
+                called = (j, state, rest[0])
+                callers = waiting.get(called)
+                if callers is None:
+                    callers = waiting[called] = []
+                    for target, pushed, rule in epsilon_moves.get((state, rest[0]), ()):
+                        add((j, called, target, pushed), (None, rule))
+                    if symbol is not None:
+                        for target, pushed, rule in moves.get((state, symbol, rest[0]), ()):
+                            add((j + 1, called, target, pushed), (None, rule))
+                callers.append(item)
+                # Фрагмент мог уже закончиться в этой же позиции (только ε-правилами)
+                for end in ends.get(called, ()):
+                    add((j, fragment, end[2], rest[1:]), (item, end))
+
+        total = len(back)
+        if position == len(word):
+            for item in layers[position]:
+                if item[1] is None and not item[3] and item[2] in self.end:
+                    return self._accept(position, total, back, item, path)
+        return NPDAResult(False, position, total)
+
+    def _accept(self, position, total, back, item, path) -> NPDAResult:
+        if not path:
+            return NPDAResult(True, position, total)
+        # Путь собирается по ссылкам: сначала часть до вызова фрагмента, затем сам фрагмент
+        rules = []
+        stack = [item]
+        while stack:
+            how = back[stack.pop()]
+            if how is None:
+                continue
+            caller, end = how
+            if caller is None:
+                rules.append(end)
+            else:
+                stack.append(end)
+                stack.append(caller)
+        output = "".join(rule[5] for rule in rules if len(rule) > 5 and rule[5] not in EPS)
+        return NPDAResult(True, position, total, rules, output)
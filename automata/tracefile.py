@@ -0,0 +1,256 @@
+import json
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .dpda import EPS, CompiledDPDA, DPDAResult, Rule
+
+# Файл трассы ДМПА (МП-преобразователя):
+#   MAGIC, длина заголовка (<I), заголовок - JSON с таблицами автомата;
+#   блоки: стек перед первым шагом блока, затем до interval записей шагов RECORD.
+#   Стек пишется разностью с предыдущим снимком: SNAPSHOT (сколько нижних символов
+#   совпадает, сколько символов дальше) и эти символы (uint16, от дна к верху).
+#   Часть стека ниже самого глубокого места, до которого опускался блок, не менялась,
+#   поэтому снимки вместе занимают не больше, чем было записано в стек;
+#   оглавление - смещения блоков (uint64), итог работы - JSON, FOOTER.
+# Запись шага - номер правила (-1 - правила нет), номер символа (-1 - ε)
+# и номер состояния перед шагом, по int16: 10^7 шагов занимают 60 МБ.
+MAGIC = b"DPDATRC1"
+RECORD = struct.Struct("<hhh")
+SNAPSHOT = struct.Struct("<II")
+FOOTER = struct.Struct("<QQQ8s")  # смещение оглавления, число записей, длина итога, MAGIC
+SNAPSHOT_INTERVAL = 65536  # Шагов между снимками стека
+BUFFER_RECORDS = 65536  # Сколько записей копится в памяти перед записью в файл
+
+
+class TraceWriter:
+    # Пишет шаги прохода в файл. Передаётся вместо trace:
+    # dpda.run(word, trace=writer) или transducer.translate(word, trace=writer).
+    # В памяти лежит не больше BUFFER_RECORDS записей, каждые interval шагов
+    # в файл попадает снимок стека, от которого читатель восстанавливает конфигурации.
+    def __init__(self, path: str, dpda: CompiledDPDA, interval: int = SNAPSHOT_INTERVAL):
+        moves = []
+        for row in [*dpda._columns.values(), dpda._epsilon_row]:
+            moves.extend(move for move in row if move is not None)
+        moves = list({id(move): move for move in moves}.values())
+        if max(len(moves), len(dpda._state_names), len(dpda.alphabet)) >= 1 << 15:
+            raise ValueError("Слишком много правил, состояний или символов для записи трассы")
+        # Снимки стека хранят номера символов стека как uint16
+        if len(dpda._stack_names) > 1 << 16:
+            raise ValueError("Слишком много символов стека для записи трассы")
+        self.dpda = dpda
+        self.interval = interval
+        self.records = 0
+        self._left = 0  # Сколько шагов осталось до следующего снимка
+        self._low = 0  # Сколько нижних символов стека не менялось с последнего снимка
+        self._width = dpda._width
+        self._rule_ids: Dict[int, int] = {id(move): i for i, move in enumerate(moves)}
+        self._symbol_ids = {symbol: i for i, symbol in enumerate(dpda.alphabet)}
+        self._buffer = array("h")
+        self._blocks = array("Q")
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "interval": interval,
+            "states": dpda._state_names,
+            "alphabet": dpda.alphabet,
+            "stack": dpda._stack_names,
+            "start_stack": dpda._start_stack,
+            "start_state": dpda._start_control // dpda._width,
+            "rules": [move[3] for move in moves],
+            "targets": [move[0] // dpda._width for move in moves],
+            "pushes": [move[1] for move in moves],
+            "outputs": [move[2] for move in moves],
+        }, ensure_ascii=False).encode("utf-8")
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+
+    def record(self, control: int, symbol: str, stack: List[int], move: Optional[tuple]):
+        # Вызывается проходом автомата перед применением правила
+        if not self._left:
+            self._write_snapshot(stack)
+        self._left -= 1
+        # Правило заменяет верхний символ, всё ниже него остаётся до следующего снимка
+        if len(stack) <= self._low:
+            self._low = len(stack) - 1
+        self._buffer.extend((-1 if move is None else self._rule_ids[id(move)], self._symbol_ids.get(symbol, -1),
+                             control // self._width))
+        self.records += 1
+        if len(self._buffer) >= 3 * BUFFER_RECORDS:
+            self._flush()
+
+    def _write_snapshot(self, stack: List[int]):
+        self._flush()
+        self._blocks.append(self._file.tell())
+        keep = min(self._low, len(stack))
+        suffix = array("H", stack[keep:])
+        self._file.write(SNAPSHOT.pack(keep, len(suffix)) + suffix.tobytes())
+        self._left = self.interval
+        self._low = len(stack)
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write(self._buffer.tobytes())
+            self._buffer = array("h")
+
+    def close(self, result: Optional[DPDAResult] = None):
+        # result - итог прохода, сохраняется в файле для читателя
+        if self._file.closed:
+            return
+        self._flush()
+        index = self._file.tell()
+        summary = {} if result is None else {
+            "accepted": result.accepted, "state": result.state, "position": result.position,
+            "stack": result.stack, "max_depth": result.max_depth, "steps": result.steps, "error": result.error,
+            "output": getattr(result, "output", None)}
+        summary = json.dumps(summary, ensure_ascii=False).encode("utf-8")
+        self._file.write(self._blocks.tobytes() + summary + FOOTER.pack(index, self.records, len(summary), MAGIC))
+        self._file.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class TraceReader:
+    # Чтение файла трассы с произвольным доступом: конфигурация перед шагом k
+    # восстанавливается от ближайшего снимка стека, т.е. не больше чем за interval шагов.
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} - не файл трассы")
+        size, = struct.unpack("<I", self._file.read(4))
+        header = json.loads(self._file.read(size).decode("utf-8"))
+        self._swap = header["byteorder"] != sys.byteorder
+        self.interval: int = header["interval"]
+        self.states: List[str] = header["states"]
+        self.alphabet: List[str] = header["alphabet"]
+        self.rules: List[Rule] = header["rules"]
+        self._stack_names: List[str] = header["stack"]
+        self._start_stack: List[int] = header["start_stack"]
+        self._start_state: int = header["start_state"]
+        self._targets: List[int] = header["targets"]
+        self._pushes: List[List[int]] = header["pushes"]
+        self._outputs: List[str] = header["outputs"]
+        self._file.seek(-FOOTER.size, 2)
+        index, self.records, size, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Файл трассы {path} не дописан")
+        self._file.seek(index)
+        blocks = (self.records + self.interval - 1) // self.interval
+        self._blocks = self._array("Q", self._file.read(8 * blocks))
+        self.summary: dict = json.loads(self._file.read(size).decode("utf-8"))
+        self._cached: Tuple[int, Optional[tuple]] = (-1, None)
+        self._suffixes: Dict[int, Tuple[int, array]] = {}
+
+    def _array(self, typecode: str, data: bytes) -> array:
+        values = array(typecode, data)
+        if self._swap:
+            values.byteswap()
+        return values
+
+    def _suffix(self, block: int) -> Tuple[int, array]:
+        # Разностная запись снимка блока: (число общих с прошлым снимком символов, остальные)
+        if block not in self._suffixes:
+            self._file.seek(self._blocks[block])
+            keep, size = SNAPSHOT.unpack(self._file.read(SNAPSHOT.size))
+            self._suffixes[block] = (keep, self._array("H", self._file.read(2 * size)))
+        return self._suffixes[block]
+
+    def _block(self, block: int) -> Tuple[List[int], array]:
+        # (снимок стека, записи блока подряд по три числа); последний блок запоминается.
+        # Снимок собирается от текущего блока назад: у каждого предыдущего берутся
+        # только символы, которых не хватает снизу
+        if self._cached[0] != block:
+            keep, suffix = self._suffix(block)
+            pieces = [suffix]
+            previous = block - 1
+            while keep:
+                previous_keep, previous_suffix = self._suffix(previous)
+                if keep > previous_keep:
+                    pieces.append(previous_suffix[:keep - previous_keep])
+                    keep = previous_keep
+                previous -= 1
+            snapshot = array("H")
+            for piece in reversed(pieces):
+                snapshot.extend(piece)
+            snapshot = snapshot.tolist()
+            self._file.seek(self._blocks[block] + SNAPSHOT.size + 2 * len(suffix))
+            count = min(self.interval, self.records - block * self.interval)
+            self._cached = (block, (snapshot, self._array("h", self._file.read(RECORD.size * count))))
+        return self._cached[1]
+
+    def __len__(self) -> int:
+        return self.records
+
+    def step(self, k: int) -> Tuple[str, str, Optional[Rule]]:
+        # (состояние, символ или ε, правило или None) шага k
+        if not 0 <= k < self.records:
+            raise IndexError(f"Нет шага {k}: в трассе {self.records} шагов")
+        _, records = self._block(k // self.interval)
+        rule, symbol, state = records[3 * (k % self.interval):3 * (k % self.interval) + 3]
+        return (self.states[state], EPS[0] if symbol < 0 else self.alphabet[symbol],
+                self.rules[rule] if rule >= 0 else None)
+
+    def configuration(self, k: int) -> Tuple[str, str, int]:
+        # (состояние, стек с верхним символом первым, глубина стека) перед шагом k;
+        # k = len(self) - конфигурация, в которой проход остановился
+        if not 0 <= k <= self.records:
+            raise IndexError(f"Нет шага {k}: в трассе {self.records} шагов")
+        if not self.records:
+            return self.states[self._start_state], self._spell(self._start_stack), len(self._start_stack) - 1
+        block = min(k, self.records - 1) // self.interval
+        snapshot, records = self._block(block)
+        stack = snapshot[:]
+        pushes = self._pushes
+        for i in range(0, 3 * (k - block * self.interval), 3):
+            rule = records[i]
+            if rule >= 0:
+                stack[-1:] = pushes[rule]
+        if k < self.records:
+            state = records[3 * (k - block * self.interval) + 2]
+        else:
+            rule, _, state = records[-3:]
+            if rule >= 0:
+                state = self._targets[rule]
+        return self.states[state], self._spell(stack), len(stack) - 1
+
+    def output(self, k: Optional[int] = None) -> str:
+        # Выход преобразователя за первые k шагов (по умолчанию - за все)
+        k = self.records if k is None else k
+        outputs = self._outputs
+        parts = []
+        for block in range((k + self.interval - 1) // self.interval):
+            _, records = self._block(block)
+            count = min(self.interval, k - block * self.interval)
+            parts.extend(outputs[rule] for rule in records[0:3 * count:3] if rule >= 0)
+        return "".join(parts)
+
+    def _spell(self, stack) -> str:
+        return "".join(map(self._stack_names.__getitem__, reversed(stack)))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def record_run(machine: CompiledDPDA, word, path: str, interval: int = SNAPSHOT_INTERVAL) -> DPDAResult:
+    # Проход автомата (или перевод, если это МП-преобразователь) с записью трассы в файл
+    writer = TraceWriter(path, machine, interval)
+    result = None
+    try:
+        if hasattr(machine, "translate"):
+            result = machine.translate(word, trace=writer)
+        else:
+            result = machine.run(word, trace=writer)
+    finally:
+        writer.close(result)
+    result.trace = None
+    return result
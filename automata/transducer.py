@@ -0,0 +1,216 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from .dpda import CompiledDPDA, DPDAResult, Rule
+
+
+@dataclass
+class TranslationResult(DPDAResult):
+    output: str = ""  # Перевод: выходы применённых правил по порядку
+
+
+class Transducer(CompiledDPDA):
+    # Детерминированный МП-преобразователь: ДМПА, правило которого дополнительно
+    # содержит шестым полем выходную цепочку (ε - пустой выход). После создания
+    # не меняется, поэтому один объект переводит сколько угодно цепочек.
+    def __init__(self, states: Iterable[str], alphabet: Iterable[str], rules: Iterable[Rule],
+                 start: str, start_stack: str, end):
+        rules = list(rules)
+        for rule in rules:
+            if len(rule) < 6:
+                raise ValueError(f"В правиле МП-преобразователя нет выходной цепочки: {rule}")
+        super().__init__(states, alphabet, rules, start, start_stack, end)
+
+    def translate(self, word, trace: bool = False) -> TranslationResult:
+        accepted, state, position, stack, max_depth, steps, error, output, history = self._execute(word, trace)
+        return TranslationResult(accepted, state, position, stack, max_depth, steps, error, history,
+                                 "".join(output))
+
+    def stream(self, restart: bool = False) -> "TransducerStream":
+        return TransducerStream(self, restart)
+
+    def translate_many(self, inputs: Iterable[str], trace: bool = False) -> List[TranslationResult]:
+        # Перевод каждой цепочки, результаты в том же порядке. Без trace таблицы
+        # загружаются в локальные переменные один раз на весь пакет, а цепочка сразу
+        # отображается в столбцы правил своих символов. Цепочки с ошибкой (их обычно
+        # мало) переводятся повторно обычным проходом, который находит место ошибки.
+        if trace:
+            return [self.translate(word, True) for word in inputs]
+        column_of = self._columns.__getitem__
+        epsilon_row = self._epsilon_row
+        accepting = self._accepting
+        start_stack = self._start_stack
+        start_control = self._start_control
+        results = []
+        append = results.append
+        for word in inputs:
+            stack = start_stack[:]
+            control = start_control
+            output = []
+            emit = output.append
+            steps = 0
+            max_depth = len(stack)
+            try:
+                for column in map(column_of, word):
+                    move = column[control]
+                    while move is None:
+                        move = epsilon_row[control]
+                        if move is None:
+                            raise KeyError
+                        base, push, out, _ = move
+                        stack[-1:] = push
+                        control = base + stack[-1]
+                        if len(stack) > max_depth:
+                            max_depth = len(stack)
+                        if out:
+                            emit(out)
+                        steps += 1
+                        move = column[control]
+                    base, push, out, _ = move
+                    stack[-1:] = push
+                    control = base + stack[-1]
+                    if len(stack) > max_depth:
+                        max_depth = len(stack)
+                    if out:
+                        emit(out)
+                    steps += 1
+                while control not in accepting:
+                    move = epsilon_row[control]
+                    if move is None:
+                        raise KeyError
+                    base, push, out, _ = move
+                    stack[-1:] = push
+                    control = base + stack[-1]
+                    if len(stack) > max_depth:
+                        max_depth = len(stack)
+                    if out:
+                        emit(out)
+                    steps += 1
+            except KeyError:  # неизвестный символ или нет правила
+                append(self.translate(word))
+                continue
+            append(TranslationResult(True, self._state_names[control // self._width], len(word), "",
+                                     max_depth - 1, steps, None, None, "".join(output)))
+        return results
+
+
+class TransducerStream:
+    # Перевод потока по частям: feed принимает очередной кусок входа и сразу возвращает
+    # выход, порождённый его символами; finish выполняет завершающие ε-правила.
+    # Хранятся только стек и счётчики, поэтому память не зависит от длины потока,
+    # пока ограничена глубина стека. restart=True переводит поток, склеенный из цепочек
+    # языка: когда для символа нет правила, а автомат в принимающей конфигурации,
+    # он начинает работу заново.
+    def __init__(self, transducer: Transducer, restart: bool = False):
+        self._transducer = transducer
+        self.restart = restart
+        self._stack = transducer._start_stack[:]
+        self._control = transducer._start_control
+        self.position = 0  # Число прочитанных символов
+        self.steps = 0
+        self.max_depth = len(self._stack) - 1  # Без служебного дна стека
+        self.chains = 0  # Число переведённых цепочек (при restart их может быть несколько)
+        self.error: Optional[str] = None  # "symbol" или "transition", как в TranslationResult
+        self.accepted = False  # Известно после finish
+        self.finished = False
+
+    def feed(self, chunk) -> str:
+        # После ошибки или finish вход больше не читается
+        if self.error or self.finished:
+            return ""
+        transducer = self._transducer
+        columns = transducer._columns
+        epsilon_row = transducer._epsilon_row
+        accepting = transducer._accepting
+        start_stack = transducer._start_stack
+        start_control = transducer._start_control
+        stack = self._stack
+        control = self._control
+        max_depth = self.max_depth + 1
+        steps = 0
+        read = 0
+        output = []
+        emit = output.append
+        for symbol in chunk:
+            column = columns.get(symbol)
+            if column is None:
+                self.error = "symbol"
+                break
+            move = column[control]
+            restarted = False
+            while move is None:
+                move = epsilon_row[control]
+                if move is None:
+                    if not self.restart or restarted or control not in accepting:
+                        break
+                    # Цепочка закончилась - этот символ начинает следующую
+                    stack[:] = start_stack
+                    control = start_control
+                    self.chains += 1
+                    restarted = True
+                    move = column[control]
+                    continue
+                base, push, out, _ = move
+                stack[-1:] = push
+                control = base + stack[-1]
+                if len(stack) > max_depth:
+                    max_depth = len(stack)
+                if out:
+                    emit(out)
+                steps += 1
+                move = column[control]
+            if move is None:
+                self.error = "transition"
+                break
+            base, push, out, _ = move
+            stack[-1:] = push
+            control = base + stack[-1]
+            if len(stack) > max_depth:
+                max_depth = len(stack)
+            if out:
+                emit(out)
+            steps += 1
+            read += 1
+        self._control = control
+        self.position += read
+        self.steps += steps
+        self.max_depth = max_depth - 1
+        return "".join(output)
+
+    def finish(self) -> str:
+        # Завершающие ε-правила; возвращает их выход. accepted - принят ли весь поток.
+        if self.finished:
+            return ""
+        self.finished = True
+        if self.error:
+            return ""
+        transducer = self._transducer
+        epsilon_row = transducer._epsilon_row
+        stack = self._stack
+        control = self._control
+        output = []
+        while control not in transducer._accepting:
+            move = epsilon_row[control]
+            if move is None:
+                self.error = "transition"
+                break
+            base, push, out, _ = move
+            stack[-1:] = push
+            control = base + stack[-1]
+            self.max_depth = max(self.max_depth, len(stack) - 1)
+            if out:
+                output.append(out)
+            self.steps += 1
+        self._control = control
+        if not self.error:
+            self.accepted = True
+            self.chains += 1
+        return "".join(output)
+
+    @property
+    def state(self) -> str:
+        return self._transducer._state_names[self._control // self._transducer._width]
+
+    @property
+    def stack(self) -> str:
+        return self._transducer._spell_stack(self._stack)
@@ -1,7 +1,25 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import json
-from itertools import product
+import os
+import sys
+
+# Общие модули лабораторных лежат уровнем выше
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from automata.dfa import CompiledDFA
+from tkjobs import BackgroundJob
+
+
+def write_chains(job, chains, total):
+    # Background job: streams the chains to the output. They come from a walk of the
+    # DFA that only follows accepting paths, so every one of them is valid and no
+    # separate membership check is needed
+    done = 0
+    for done, chain in enumerate(chains, 1):
+        job.write(chain + "\n")
+        job.progress(done, total)
+    return done
+
 
 class GrammarToDFAApp:
     def __init__(self, root):
@@ -11,6 +29,8 @@ class GrammarToDFAApp:
         # Initialize grammar and DFA structures
         self.grammar = ""
         self.dfa = {}
+        self.job = None
+        self.chain_counts = {}
         
         # Set up GUI
         self.setup_menu()
@@ -51,14 +71,18 @@ class GrammarToDFAApp:
         # Generate DFA button
         tk.Button(frame, text="Generate DFA", command=self.generate_dfa).grid(row=3, column=0, pady=5)
         
-        # Chain generation and validation
+        # Chain generation
         tk.Label(frame, text="Chain Length Range (min, max):").grid(row=4, column=0, sticky="w")
         self.min_length = tk.Entry(frame, width=5)
         self.min_length.grid(row=4, column=1, sticky="w")
         self.max_length = tk.Entry(frame, width=5)
         self.max_length.grid(row=4, column=1, sticky="e")
 
-        tk.Button(frame, text="Generate and Validate Chains", command=self.generate_and_validate_chains).grid(row=5, column=0, pady=5)
+        tk.Button(frame, text="Generate Chains", command=self.generate_language_chains).grid(row=5, column=0, pady=5)
+        self.cancel_button = tk.Button(frame, text="Cancel", state=tk.DISABLED, command=self.cancel_generation)
+        self.cancel_button.grid(row=5, column=1, pady=5)
+        self.progress_label = tk.Label(frame, text="")
+        self.progress_label.grid(row=5, column=2, sticky="w")
         
         # Output area
         tk.Label(frame, text="Output:").grid(row=6, column=0, sticky="w")
@@ -69,7 +93,7 @@ class GrammarToDFAApp:
         messagebox.showinfo("Author", "Developer: Маландий Иван\nEmail: ivanlocked55@gmail.com")
 
     def show_theme(self):
-        messagebox.showinfo("Theme", "This program converts a given regular grammar to an equivalent DFA, generates chains, and validates them.")
+        messagebox.showinfo("Theme", "This program converts a given regular grammar to an equivalent DFA and generates the chains it accepts.")
 
     def load_grammar_from_file(self):
         file_path = filedialog.askopenfilename(title="Open Grammar File", filetypes=[("Text Files", "*.txt")])
@@ -96,129 +120,201 @@ class GrammarToDFAApp:
                 self.dfa = self.convert_grammar_to_dfa_pl(self.grammar)
             else:
                 self.dfa = self.convert_grammar_to_dfa_ll(self.grammar)
+            self.dfa = self.minimize_dfa(self.dfa)
             self.display_output("DFA generated successfully!\n\nTransition Table:\n" + json.dumps(self.dfa, indent=4))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate DFA: {e}")
 
     def convert_grammar_to_dfa_pl(self, grammar):
-        rules = [line.strip() for line in grammar.split("\n") if line.strip()]
-        states = set()
-        alphabet = set()
-        transitions = {}
-        start_state = "q0"
-        accept_states = set()
-
-        state_map = {}  # Map grammar non-terminals to DFA states
-        current_state_id = 0
-
-        def get_state(non_terminal):
-            nonlocal current_state_id
-            if non_terminal not in state_map:
-                state_map[non_terminal] = f"q{current_state_id}"
-                current_state_id += 1
-            return state_map[non_terminal]
+        return self.nfa_to_dfa(*self.build_nfa(grammar, left_linear=False))
 
+    def convert_grammar_to_dfa_ll(self, grammar):
+        return self.nfa_to_dfa(*self.build_nfa(grammar, left_linear=True))
+
+    def build_nfa(self, grammar, left_linear):
+        # NFA states are the nonterminals, one extra state - the final state for a
+        # right-linear grammar or the initial state for a left-linear one - and fresh
+        # states inside long productions. A right-linear S -> abA becomes the chain
+        # S --a--> S#1 --b--> A, and S -> ab ends the chain in the final state; a
+        # left-linear S -> Aab becomes A --a--> S#1 --b--> S, and S -> ab starts it in
+        # the initial state. Unit and empty productions (S -> A, S -> ε) are ε-moves,
+        # which are folded into the moves here. Both automata read the chain left to right.
+        # Returns (state names, alphabet, moves, start mask, accept mask) where
+        # moves[state][symbol] is the bitmask of target states.
+        rules = [line.strip() for line in grammar.split("\n") if line.strip()]
+        names = ["final" if not left_linear else "initial"]
+        ids = {}
+        moves = [{}]
+        epsilon = [0]
+
+        def get_state(name):
+            if name not in ids:
+                ids[name] = new_state(name)
+            return ids[name]
+
+        def new_state(name):
+            names.append(name)
+            moves.append({})
+            epsilon.append(0)
+            return len(names) - 1
+
+        def add_move(from_state, symbol, to_state):
+            moves[from_state][symbol] = moves[from_state].get(symbol, 0) | (1 << to_state)
+
+        def add_chain(from_state, terminals, to_state, owner):
+            # from_state reads the terminals one by one and ends in to_state
+            if not terminals:
+                epsilon[from_state] |= 1 << to_state
+                return
+            for position, symbol in enumerate(terminals[:-1], 1):
+                step = new_state(f"{names[owner]}#{position}")
+                add_move(from_state, symbol, step)
+                from_state = step
+            add_move(from_state, terminals[-1], to_state)
+
+        parsed = []
         for rule in rules:
             if "->" not in rule:
                 raise ValueError(f"Invalid grammar rule: {rule}")
-
-            lhs, rhs = map(str.strip, rule.split("->"))
-            from_state = get_state(lhs)
-            states.add(from_state)
-
-            for option in rhs.split("|"):
-                option = option.strip()
-                if len(option) == 1 and option.islower():
-                    # Terminal-only production (e.g., S -> b)
-                    alphabet.add(option)
-                    if from_state not in transitions:
-                        transitions[from_state] = {}
-                    # Create a new accept state for the terminal
-                    accept_state = f"q{current_state_id}"
-                    current_state_id += 1
-                    transitions[from_state][option] = accept_state
-                    accept_states.add(accept_state)
-                    states.add(accept_state)
-                elif len(option) == 2 and option[0].islower() and option[1].isupper():
-                    # Terminal followed by non-terminal (e.g., S -> aA)
-                    symbol, next_non_terminal = option
-                    alphabet.add(symbol)
-                    to_state = get_state(next_non_terminal)
-                    states.add(to_state)
-                    if from_state not in transitions:
-                        transitions[from_state] = {}
-                    transitions[from_state][symbol] = to_state
+            lhs, rhs = map(str.strip, rule.split("->", 1))
+            if not lhs or any(c.isspace() for c in lhs):
+                raise ValueError(f"Invalid nonterminal in rule: {rule}")
+            parsed.append((get_state(lhs), [option.strip() for option in rhs.split("|")]))
+        goal = ids["S"] if "S" in ids else parsed[0][0]
+
+        # Names with their own rules are nonterminals, and so is a single capital
+        # letter without rules (it derives nothing, so it only makes a dead branch)
+        non_terminals = set(ids)
+        alphabet = set()
+        for lhs, options in parsed:
+            for option in options:
+                terminals, non_terminal = self.split_option(option, non_terminals, left_linear)
+                alphabet.update(terminals)
+                if non_terminal is None:
+                    target = 0
+                else:
+                    target = get_state(non_terminal)
+                if left_linear:
+                    add_chain(target, terminals, lhs, lhs)
+                else:
+                    add_chain(lhs, terminals, target, lhs)
+
+        # ε-closure of every state, then every move and the start go straight to closures
+        closure = list(epsilon)
+        for state in range(len(names)):
+            reach = closure[state] | (1 << state)
+            pending = closure[state]
+            while pending:
+                lowest = pending & -pending
+                pending ^= lowest
+                extra = closure[lowest.bit_length() - 1] & ~reach
+                reach |= extra
+                pending |= extra
+            closure[state] = reach
+
+        def close(mask):
+            result = 0
+            while mask:
+                lowest = mask & -mask
+                result |= closure[lowest.bit_length() - 1]
+                mask ^= lowest
+            return result
+
+        moves = [{symbol: close(mask) for symbol, mask in row.items()} for row in moves]
+        if left_linear:
+            return names, sorted(alphabet), moves, closure[0], 1 << goal
+        return names, sorted(alphabet), moves, closure[goal], 1 << 0
+
+    def split_option(self, option, non_terminals, left_linear):
+        # Splits a right-hand side into (terminal characters, nonterminal or None).
+        # Symbols may be separated by spaces (S -> if Cond); otherwise the longest
+        # nonterminal name at the end (right-linear) or start (left-linear) is taken,
+        # or a single capital letter there if no known name fits.
+        # Everything else is a string of one-character terminals; ε, eps, λ or an
+        # empty option is the empty chain.
+        if option in ("", "ε", "eps", "EPS", "λ"):
+            return "", None
+        tokens = option.split()
+        if len(tokens) == 1:
+            tokens = []
+            for name in sorted(non_terminals, key=len, reverse=True):
+                if (option.startswith(name) if left_linear else option.endswith(name)) and len(name) < len(option):
+                    rest = option[len(name):] if left_linear else option[:-len(name)]
+                    tokens = [name, rest] if left_linear else [rest, name]
+                    break
+            if not tokens:
+                if option in non_terminals or len(option) == 1 and option.isupper():
+                    return "", option
+                # A capital letter without rules at the edge is still a nonterminal
+                edge = option[0] if left_linear else option[-1]
+                if edge.isupper():
+                    tokens = [edge, option[1:]] if left_linear else [option[:-1], edge]
+                else:
+                    tokens = [option]
+        is_non_terminal = [token in non_terminals or len(token) == 1 and token.isupper() for token in tokens]
+        edge = 0 if left_linear else len(tokens) - 1
+        if any(flag for i, flag in enumerate(is_non_terminal) if i != edge):
+            side = "first" if left_linear else "last"
+            raise ValueError(f"Production '{option}' is not {'left' if left_linear else 'right'}-linear: "
+                             f"only the {side} symbol may be a nonterminal")
+        non_terminal = tokens[edge] if is_non_terminal[edge] else None
+        terminals = "".join(token for i, token in enumerate(tokens) if not (i == edge and is_non_terminal[i]))
+        if any(symbol in non_terminals for symbol in terminals):
+            raise ValueError(f"Production '{option}' is not {'left' if left_linear else 'right'}-linear: "
+                             f"a nonterminal is inside the terminal string")
+        return terminals, non_terminal
+
+    def nfa_to_dfa(self, names, alphabet, moves, start, accept):
+        # Lazy subset construction: a DFA state is a set of NFA states encoded as an int
+        # bitmask, and only subsets reachable from the start are ever built. The row of
+        # a subset is collected from the moves of its members, so the work per subset
+        # is proportional to their moves rather than to the whole alphabet.
+        # An empty subset is the dead state and gets no transitions.
+        subset_ids = {start: 0}
+        subsets = [start]
+        transitions = {}
+        for current in subsets:  # the list grows while new subsets are discovered
+            targets = {}
+            rest = current
+            while rest:
+                lowest = rest & -rest
+                for symbol, mask in moves[lowest.bit_length() - 1].items():
+                    targets[symbol] = targets.get(symbol, 0) | mask
+                rest ^= lowest
+            row = {}
+            for symbol in sorted(targets):
+                target = targets[symbol]
+                if target not in subset_ids:
+                    subset_ids[target] = len(subsets)
+                    subsets.append(target)
+                row[symbol] = f"q{subset_ids[target]}"
+            if row:
+                transitions[f"q{subset_ids[current]}"] = row
 
         return {
-            "states": list(states),
-            "alphabet": list(alphabet),
+            "states": [f"q{i}" for i in range(len(subsets))],
+            "alphabet": alphabet,
             "transitions": transitions,
-            "start_state": start_state,
-            "accept_states": list(accept_states)
+            "start_state": "q0",
+            "accept_states": [f"q{i}" for i, subset in enumerate(subsets) if subset & accept]
         }
 
-    def convert_grammar_to_dfa_ll(self, grammar):
-        rules = [line.strip() for line in grammar.split("\n") if line.strip()]
-        states = set()
-        alphabet = set()
-        transitions = {}
-        start_state = "q0"
-        accept_states = set()
-
-        state_map = {}  # Map grammar non-terminals to DFA states
-        current_state_id = 0
-
-        def get_state(non_terminal):
-            nonlocal current_state_id
-            if non_terminal not in state_map:
-                state_map[non_terminal] = f"q{current_state_id}"
-                current_state_id += 1
-            return state_map[non_terminal]
-
-        # Initialize start state
-        start_state = get_state("S")
-        states.add(start_state)
-        print(start_state)
-        for rule in rules:
-            if "->" not in rule:
-                raise ValueError(f"Invalid grammar rule: {rule}")
-
-            lhs, rhs = map(str.strip, rule.split("->"))
-            from_state = get_state(lhs)
-            states.add(from_state)
-
-            for option in rhs.split("|"):
-                option = option.strip()
-                if len(option) == 1 and option.islower():
-                    # Terminal-only production (e.g., S -> b)
-                    alphabet.add(option)
-                    if from_state not in transitions:
-                        transitions[from_state] = {}
-                    # Create a new accept state for the terminal
-                    accept_state = f"q{current_state_id}"
-                    current_state_id += 1
-                    transitions[from_state][option] = accept_state
-                    accept_states.add(accept_state)
-                    states.add(accept_state)
-                elif len(option) == 2 and option[0].isupper() and option[1].islower():
-                    # Non-terminal followed by terminal (e.g., S -> Aa)
-                    next_non_terminal, symbol = option
-                    alphabet.add(symbol)
-                    to_state = get_state(next_non_terminal)
-                    states.add(to_state)
-                    if to_state not in transitions:
-                        transitions[to_state] = {}
-                    transitions[to_state][symbol] = from_state
-
+    def minimize_dfa(self, dfa):
+        # Equivalent states (e.g. the accept states created for every S -> b) are merged
+        minimal, _ = CompiledDFA(dfa["states"], dfa["alphabet"], dfa["transitions"],
+                                 dfa["start_state"], dfa["accept_states"]).minimize()
         return {
-            "states": list(states),
-            "alphabet": list(alphabet),
-            "transitions": transitions,
-            "start_state": start_state,
-            "accept_states": list(accept_states)
+            "states": minimal.states,
+            "alphabet": minimal.symbols,
+            "transitions": minimal.transitions(),
+            "start_state": minimal.states[minimal.start],
+            "accept_states": minimal.accepting_states()
         }
 
-    def generate_and_validate_chains(self):
+    def generate_language_chains(self):
+        if self.job is not None and self.job.is_running():
+            messagebox.showinfo("Info", "Generation is already running.")
+            return
         try:
             min_len = int(self.min_length.get())
             max_len = int(self.max_length.get())
@@ -226,43 +322,69 @@ class GrammarToDFAApp:
             if min_len > max_len or min_len < 0:
                 raise ValueError("Invalid length range.")
 
+            self.chain_counts = self.count_chains(self.dfa, min_len, max_len)
             chains = self.generate_chains(self.dfa, min_len, max_len)
-            valid_chains = [chain for chain in chains if self.validate_chain(self.dfa, chain)]
-            
-            self.display_output(f"Generated Chains: {chains}\nValid Chains: {valid_chains}")
+            self.display_output(f"Chains per length: {self.chain_counts}\nChains:\n")
+            self.progress_label.config(text="Generating...")
+            self.job = BackgroundJob(self.root, self.output_area, write_chains, chains,
+                                     sum(self.chain_counts.values()), on_done=self.generation_done,
+                                     status=self.progress_label, cancel_button=self.cancel_button,
+                                     progress_text="Generated {done}/{total}", cancelled_text="Cancelled",
+                                     error_title="Error").start()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate or validate chains: {e}")
+            messagebox.showerror("Error", f"Failed to generate chains: {e}")
+
+    def cancel_generation(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def generation_done(self, done):
+        self.progress_label.config(text=f"Generated {done} chains")
+
+    def completion_table(self, dfa, max_len):
+        # table[k] is the set of states from which some accepted chain of exactly k more
+        # symbols exists (backward DP from the accept states)
+        table = [set(dfa["accept_states"])]
+        for _ in range(max_len):
+            previous = table[-1]
+            table.append({state for state, row in dfa["transitions"].items()
+                          if any(target in previous for target in row.values())})
+        return table
 
     def generate_chains(self, dfa, min_len, max_len):
-        alphabet = dfa.get("alphabet", [])
-        chains = []
+        # Walks the DFA and extends only prefixes that can still be completed to an
+        # accepted chain of the current length; chains come out in shortlex order
+        alphabet = sorted(dfa.get("alphabet", []))
+        transitions = dfa["transitions"]
+        table = self.completion_table(dfa, max_len)
         for length in range(min_len, max_len + 1):
-            chains.extend(["".join(p) for p in product(alphabet, repeat=length)])
-        return chains
-
-    # def validate_chain(self, dfa, chain):
-    #     current_state = dfa["start_state"]
-    #     for symbol in chain:
-    #         if symbol not in dfa["alphabet"]:
-    #             return False
-    #         current_state = dfa["transitions"].get(current_state, {}).get(symbol)
-    #         if current_state is None:
-    #             return False
-    #     return current_state in dfa["accept_states"]
-    
-    def validate_chain(self, dfa, chain):
-        current_state = dfa["start_state"]
-        # For LL grammar, process the chain from the end to the beginning
-        if self.grammar_type.get() == "LL":
-            chain = chain[::-1]  # Reverse the chain
-
-        for symbol in chain:
-            if symbol not in dfa["alphabet"]:
-                return False
-            current_state = dfa["transitions"].get(current_state, {}).get(symbol)
-            if current_state is None:
-                return False
-        return current_state in dfa["accept_states"]
+            if dfa["start_state"] not in table[length]:
+                continue
+            stack = [(dfa["start_state"], "")]
+            while stack:
+                state, prefix = stack.pop()
+                left = length - len(prefix)
+                if not left:
+                    yield prefix
+                    continue
+                row = transitions.get(state, {})
+                for symbol in reversed(alphabet):
+                    target = row.get(symbol)
+                    if target is not None and target in table[left - 1]:
+                        stack.append((target, prefix + symbol))
+
+    def count_chains(self, dfa, min_len, max_len):
+        # Number of accepted chains of every length, without building them
+        counts = {state: 0 for state in dfa["states"]}
+        for state in dfa["accept_states"]:
+            counts[state] = 1
+        result = {}
+        for length in range(max_len + 1):
+            if length >= min_len:
+                result[length] = counts[dfa["start_state"]]
+            counts = {state: sum(counts[target] for target in dfa["transitions"].get(state, {}).values())
+                      for state in dfa["states"]}
+        return result
 
     def display_output(self, text):
         self.output_area.config(state=tk.NORMAL)
@@ -1,73 +1,9 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
-
-@dataclass
-class Grammar:
-    VT: List[str]  # Терминальные символы
-    VN: List[str]  # Нетерминальные символы
-    P: Dict[str, List[str]]  # Правила вывода
-    S: str  # Начальный символ
-
-def parse_grammar_input(VT: str, VN: str, rules: List[str], S: str) -> Grammar:
-    VT_list = VT.split()
-    VN_list = VN.split()
-    P = {}
-    for rule in rules:
-        left, right = rule.split("->")
-        left = left.strip()
-        right_options = [opt.strip() for opt in right.split("|")]
-        P[left] = right_options
-    return Grammar(VT_list, VN_list, P, S)
-
-def generate_chains(grammar: Grammar, min_len: int, max_len: int, leftmost: bool) -> List[str]:
-    results = set()
-    queue = [(grammar.S, [grammar.S])]  # (цепочка, история вывода)
-
-    while queue:
-        current, history = queue.pop(0)
-
-        # Если цепочка состоит только из терминалов и её длина в пределах диапазона
-        if all(c in grammar.VT for c in current):
-            if min_len <= len(current) <= max_len:
-                results.add(current)
-            continue
-
-        # Если длина цепочки превышает максимальную, пропускаем её
-        if len(current) > max_len:
-            continue
-
-        # Находим все нетерминалы для замены
-        for i, symbol in enumerate(current):
-            if symbol in grammar.VN:
-                for replacement in grammar.P[symbol]:
-                    new_chain = current[:i] + replacement + current[i + 1:]
-                    new_history = history + [new_chain]
-                    queue.append((new_chain, new_history))
-                break  # Заменяем только первый нетерминал (левосторонний вывод)
-
-    return sorted(results)
-
-def build_parse_tree(chain: str, grammar: Grammar, leftmost: bool) -> List[str]:
-    tree = []
-    current = grammar.S
-
-    def replace_first_nonterminal(sequence, symbol, replacement):
-        index = sequence.find(symbol)
-        return sequence[:index] + replacement + sequence[index + 1:]
-
-    while current != chain:
-        for i, symbol in enumerate(current if leftmost else reversed(current)):
-            if symbol in grammar.VN:
-                for replacement in grammar.P[symbol]:
-                    candidate = replace_first_nonterminal(current, symbol, replacement)
-                    if chain.startswith(candidate) or chain.endswith(candidate):
-                        tree.append((current, symbol, replacement))
-                        current = candidate
-                        break
-                break
-    return tree
+from tkinter import messagebox
+
+from automata.grammar import (CountLimitExceeded, Grammar, build_parse_tree, count_chains, iter_chains,
+                              parse_grammar_input)
+from tkjobs import BackgroundJob
 
 class GrammarApp:
     def __init__(self, master):
@@ -125,10 +61,18 @@ class GrammarApp:
         # Кнопки управления
         tk.Button(master, text="Сгенерировать цепочки", command=self.generate_chains).grid(row=9, column=0, pady=10)
         tk.Button(master, text="Построить дерево вывода", command=self.build_tree).grid(row=9, column=1, pady=10)
+        tk.Button(master, text="Подсчитать по длинам", command=self.count_chains).grid(row=9, column=2, pady=10)
 
         # Вывод результатов
         self.output = tk.Text(master, height=10, width=50)
-        self.output.grid(row=10, column=0, columnspan=2, pady=5)
+        self.output.grid(row=10, column=0, columnspan=3, pady=5)
+
+        # Генерация, подсчёт и построение дерева идут в фоновом потоке, их можно прервать
+        self.job = None
+        self.cancel_button = tk.Button(master, text="Отмена", state="disabled", command=self.cancel_job)
+        self.cancel_button.grid(row=11, column=0, pady=5)
+        self.status = tk.Label(master, text="")
+        self.status.grid(row=11, column=1, columnspan=2, sticky="w")
 
         self.toggle_grammar_input()
 
@@ -139,35 +83,84 @@ class GrammarApp:
         self.rules_text.config(state=state)
         self.s_entry.config(state=state)
 
+    def read_grammar(self):
+        if self.use_default.get():
+            self.grammar = self.default_grammar
+        else:
+            self.grammar = parse_grammar_input(
+                self.vt_entry.get(),
+                self.vn_entry.get(),
+                self.rules_text.get("1.0", tk.END).strip().splitlines(),
+                self.s_entry.get().strip(),
+            )
+
+    def start_job(self, work, *args, progress_text="", error_title="Ошибка"):
+        if self.job is not None and self.job.is_running():
+            messagebox.showinfo("Выполнение", "Предыдущее задание ещё выполняется.")
+            return
+        self.output.delete("1.0", tk.END)
+        self.status.config(text="")
+        self.job = BackgroundJob(self.master, self.output, work, *args, status=self.status,
+                                 cancel_button=self.cancel_button, progress_text=progress_text,
+                                 error_title=error_title).start()
+
     def generate_chains(self):
         try:
-            if self.use_default.get():
-                self.grammar = self.default_grammar
-            else:
-                self.grammar = parse_grammar_input(
-                    self.vt_entry.get(),
-                    self.vn_entry.get(),
-                    self.rules_text.get("1.0", tk.END).strip().splitlines(),
-                    self.s_entry.get().strip(),
-                )
-
+            self.read_grammar()
             min_len = int(self.min_len_entry.get())
             max_len = int(self.max_len_entry.get())
-
-            chains = generate_chains(self.grammar, min_len, max_len, self.leftmost.get())
-            self.output.delete("1.0", tk.END)
-            self.output.insert(tk.END, "\n".join(chains))
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка генерации: {e}")
+            return
+
+        # Цепочки выводятся по мере нахождения, не дожидаясь конца перебора
+        self.start_job(self._generate, self.grammar, min_len, max_len, progress_text="Найдено цепочек: {done}")
+
+    def _generate(self, job, grammar, min_len, max_len):
+        # Выполняется в фоновом потоке
+        for count, chain in enumerate(iter_chains(grammar, min_len, max_len, order="shortlex")):
+            job.write(("\n" if count else "") + chain)
+            job.progress(count + 1)
+
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def count_chains(self):
+        try:
+            self.read_grammar()
+            max_len = int(self.max_len_entry.get())
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Ошибка подсчёта: {e}")
+            return
+        self.start_job(self._count, self.grammar, max_len, error_title="Ошибка подсчёта")
+
+    def _count(self, job, grammar, max_len):
+        # Выполняется в фоновом потоке. Различные цепочки грамматики, однозначность
+        # которой не доказана, считаются перебором; если их слишком много, выводится
+        # число деревьев вывода - оно считается за полиномиальное время
+        try:
+            counts = count_chains(grammar, max_len)
+        except CountLimitExceeded:
+            counts = count_chains(grammar, max_len, derivations=True)
+            job.write("Различных цепочек слишком много для перебора. Показано число деревьев вывода:\n"
+                      "у неоднозначной грамматики оно больше числа различных цепочек.\n")
+        job.write("\n".join(f"{length}: {count}" for length, count in enumerate(counts)))
 
     def build_tree(self):
         try:
             chain = self.output.get("sel.first", "sel.last").strip()
-            tree = build_parse_tree(chain, self.grammar, self.leftmost.get())
-            self.output.delete("1.0", tk.END)
-            self.output.insert(tk.END, "\n".join(f"{step[0]} => {step[2]}" for step in tree))
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка построения дерева: {e}")
+            return
+        # Разбор неоднозначной грамматики занимает время, кубическое по длине цепочки
+        self.start_job(self._build_tree, chain, self.grammar, self.leftmost.get(),
+                       error_title="Ошибка построения дерева")
+
+    def _build_tree(self, job, chain, grammar, leftmost):
+        # Выполняется в фоновом потоке
+        tree = build_parse_tree(chain, grammar, leftmost)
+        job.write("\n".join(f"{step[0]} => {step[2]}" for step in tree))
 
 if __name__ == "__main__":
     root = tk.Tk()
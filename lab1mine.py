@@ -1,9 +1,13 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List
 import tkinter as tk
 from tkinter import messagebox, ttk
 from tkinter.scrolledtext import ScrolledText
 
+import automata.grammar
+from automata.earley import TreeNode, parse
+from tkjobs import BackgroundJob, ListboxOutput
+
 @dataclass
 class Grammar:
     VT: List[str]
@@ -11,47 +15,13 @@ class Grammar:
     P: Dict[str, List[str]]
     S: str
 
-def count_non_term_sym(grammar, sequence):
-    length = 0
-    for sym in sequence:
-        if sym in grammar.VT:
-            length += 1
-    return length
-
-def generate_chains(grammar, left_border, right_border):
-    rules = list(grammar.S)
-    used_sequence = set()
-    chains = []
-    while rules:
-        sequence = rules.pop()
-        if sequence in used_sequence:
-            continue
-        used_sequence.add(sequence)
-        no_term = True
-        for i, symbol in enumerate(sequence):
-            if symbol in grammar.VN:
-                no_term = False
-                for elem in grammar.P[symbol]:
-                    temp = sequence[:i] + elem + sequence[i + 1:]
-                    if count_non_term_sym(grammar, temp) <= right_border and temp not in rules:
-                        rules.append(temp)
-            elif symbol not in grammar.VT:
-                no_term = False
-                break
-        if no_term and left_border <= len(sequence) <= right_border:
-            chains.append(sequence if sequence else "λ")
-    return chains
-
-class TreeNode:
-    def __init__(self, symbol: str):
-        self.symbol = symbol
-        self.children: List[TreeNode] = []
+def generate_chains(grammar, left_border, right_border, limit=None):
+    return list(iter_chains(grammar, left_border, right_border, limit=limit))
 
-    def add_child(self, child: "TreeNode"):
-        self.children.append(child)
-
-    def __repr__(self):
-        return f"TreeNode({self.symbol})"
+def iter_chains(grammar, left_border, right_border, limit=None):
+    # Цепочки отдаются по мере нахождения в порядке длина-лексикографический
+    for chain in automata.grammar.iter_chains(grammar, left_border, right_border, order="shortlex", limit=limit):
+        yield chain if chain else "λ"
 
 class GrammarApp:
     def __init__(self, root):
@@ -60,6 +30,7 @@ class GrammarApp:
         
         self.grammar = None
         self.chains = []
+        self.job = None  # Генерация идёт в фоновом потоке, её можно прервать
         
         self.create_widgets()
     
@@ -109,6 +80,13 @@ class GrammarApp:
         self.generate_button = ttk.Button(self.root, text="Сгенерировать цепочки", command=self.generate_chains)
         self.generate_button.pack(padx=10, pady=10)
         
+        self.job_frame = ttk.Frame(self.root)
+        self.job_frame.pack(padx=10, fill="x")
+        self.cancel_button = ttk.Button(self.job_frame, text="Отмена", state="disabled", command=self.cancel_job)
+        self.cancel_button.pack(side="left")
+        self.status_label = ttk.Label(self.job_frame, text="")
+        self.status_label.pack(side="left", padx=10)
+        
         # Список сгенерированных цепочек
         self.chains_frame = ttk.LabelFrame(self.root, text="Сгенерированные цепочки")
         self.chains_frame.pack(padx=10, pady=10, fill="both", expand=True)
@@ -162,10 +140,26 @@ class GrammarApp:
                 messagebox.showerror("Ошибка", f"Некорректный ввод грамматики: {e}")
                 return
         
-        self.chains = generate_chains(self.grammar, left_border, right_border)
+        if self.job is not None and self.job.is_running():
+            messagebox.showinfo("Генерация", "Генерация уже выполняется.")
+            return
+        self.chains = []
         self.chains_listbox.delete(0, tk.END)
-        for chain in self.chains:
-            self.chains_listbox.insert(tk.END, chain)
+        # Цепочки попадают в список пачками по мере нахождения
+        self.job = BackgroundJob(self.root, ListboxOutput(self.chains_listbox), self._generate, self.grammar,
+                                 left_border, right_border, self.chains, status=self.status_label,
+                                 cancel_button=self.cancel_button, progress_text="Найдено цепочек: {done}").start()
+    
+    def _generate(self, job, grammar, left_border, right_border, chains):
+        # Выполняется в фоновом потоке
+        for chain in iter_chains(grammar, left_border, right_border):
+            chains.append(chain)
+            job.write(chain + "\n")
+            job.progress(len(chains))
+    
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
     
     def build_tree(self):
         selected_chain = self.chains_listbox.get(tk.ACTIVE)
@@ -173,10 +167,12 @@ class GrammarApp:
             messagebox.showerror("Ошибка", "Выберите цепочку для построения дерева")
             return
         
-        # Построение дерева вывода
-        tree_root = self.generate_tree(self.grammar.S, selected_chain)
+        # Построение дерева вывода алгоритмом Эрли
+        tree_root, forest = parse(self.grammar, "" if selected_chain == "λ" else selected_chain)
         if tree_root:
             tree_structure = self.tree_to_string(tree_root)
+            if forest is not None:
+                tree_structure += "\nЦепочка неоднозначна: показано одно из деревьев вывода\n"
             self.tree_output.config(state="normal")
             self.tree_output.delete("1.0", tk.END)
             self.tree_output.insert(tk.END, tree_structure)
@@ -184,42 +180,14 @@ class GrammarApp:
         else:
             messagebox.showerror("Ошибка", "Не удалось построить дерево для выбранной цепочки")
     
-    def generate_tree(self, current_symbol: str, target_chain: str) -> Optional[TreeNode]:
-        if current_symbol in self.grammar.VT:
-            if target_chain.startswith(current_symbol):
-                return TreeNode(current_symbol)
-            else:
-                return None
-        
-        if current_symbol in self.grammar.VN:
-            for production in self.grammar.P[current_symbol]:
-                node = TreeNode(current_symbol)
-                remaining_chain = target_chain
-                valid = True
-                for symbol in production:
-                    if symbol in self.grammar.VT:
-                        if remaining_chain.startswith(symbol):
-                            node.add_child(TreeNode(symbol))
-                            remaining_chain = remaining_chain[len(symbol):]
-                        else:
-                            valid = False
-                            break
-                    else:
-                        child_node = self.generate_tree(symbol, remaining_chain)
-                        if not child_node:
-                            valid = False
-                            break
-                        node.add_child(child_node)
-                        remaining_chain = remaining_chain[len(self.tree_to_string(child_node).replace("\n", "")):]
-                if valid and not remaining_chain:
-                    return node
-        return None
-    
-    def tree_to_string(self, node: TreeNode, level=0) -> str:
-        result = "  " * level + node.symbol + "\n"
-        for child in node.children:
-            result += self.tree_to_string(child, level + 1)
-        return result
+    def tree_to_string(self, node: TreeNode) -> str:
+        lines = []
+        stack = [(node, 0)]
+        while stack:
+            current, level = stack.pop()
+            lines.append("  " * level + current.symbol + "\n")
+            stack.extend((child, level + 1) for child in reversed(current.children))
+        return "".join(lines)
 
 if __name__ == '__main__':
     root = tk.Tk()
@@ -42,9 +42,9 @@ data = {"VT": ["0", "1"],
         "P": {"A": ["0A1A", "1A0A", ""]},
         "S": "A"}
 # data = grammar_input()
-left_border, right_border = map(int, input("Введите диапозон цепочек ОТ и ДО\n").split())
 
 if __name__ == '__main__':
+    left_border, right_border = map(int, input("Введите диапозон цепочек ОТ и ДО\n").split())
     grammar = Grammar(data["VT"], data["VN"], data["P"], data["S"])
     print(grammar)
     rules = list(grammar.S)
@@ -4,7 +4,18 @@ from tkinter import *
 from tkinter import filedialog, messagebox, scrolledtext
 from functools import partial
 from os import path
-import json
+
+from automata import loader
+from automata.dfa import CompiledDFA, read_words
+from tkjobs import BackgroundJob
+
+# Сколько результатов пакетной проверки выводить в окно
+BATCH_OUTPUT_LIMIT = 1000
+# Сколько непрочитанных символов показывать в шаге трассы: длинная цепочка
+# целиком в каждой строке сделала бы вывод квадратичным по её длине
+TRACE_WINDOW = 40
+# Сколько слов из файла проверяется за один вызов run_batch (между проверками отмены)
+BATCH_SIZE = 100_000
 
 
 @dataclass
@@ -17,18 +28,27 @@ class Machine:
 
 
 def machine_input(filename):
+    # Файл проверяет automata.loader; автомат сразу минимизируется, результат
+    # запоминается по хешу файла
     try:
-        with open(filename, "r") as json_file:
-            data = json.load(json_file)
-    except FileNotFoundError:
-        messagebox.showerror("Ошибка", "Файл с данными не найден.")
+        loaded = loader.load_machine(filename)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Ошибка", f"Не удалось загрузить автомат: {e}")
+        return None
+    spec = loaded.spec
+    if spec.kind != "dfa":
+        messagebox.showerror("Ошибка", "В файле описан МП-автомат, а не ДКА.")
         return None
-    states = data["states"]
-    alphabet = data["alphabet"]
-    func = data["Func"]
-    start = data["start"]
-    ends = data["ends"]
-    return Machine(states, alphabet, func, start, ends)
+    if loaded.digest not in minimal_machines:
+        minimal_machines[loaded.digest] = minimize_machine(Machine(spec.states, spec.alphabet, spec.transitions,
+                                                                   spec.start, spec.end))
+    return minimal_machines[loaded.digest]
+
+
+def minimize_machine(machine):
+    minimal, _ = CompiledDFA.from_machine(machine).minimize()
+    return Machine(minimal.states, minimal.symbols, minimal.transitions(), minimal.states[minimal.start],
+                   minimal.accepting_states())
 
 
 def generate_func_tab(machine, frame):
@@ -77,50 +97,152 @@ def display_machine(machine):
     txt = Entry(input_frame, width=60)
     txt.grid(row=1, column=0, sticky="ew")
 
-    btn_check_word = Button(input_frame, text="Проверить", command=partial(check_button, machine), padx=10, pady=10)
+    global current_dfa
+    current_dfa = CompiledDFA.from_machine(machine)
+    btn_check_word = Button(input_frame, text="Проверить", command=partial(check_button, current_dfa),
+                            padx=10, pady=10)
     btn_check_word.grid(row=1, column=1, sticky="e")
 
+    global trace_enabled
+    trace_enabled = BooleanVar(value=True)
+    chk_trace = Checkbutton(input_frame, text="Показывать шаги", variable=trace_enabled)
+    chk_trace.grid(row=2, column=0, sticky="w")
+
+    # Проверка идёт в фоновом потоке, её можно прервать
+    global btn_cancel, lbl_status
+    btn_cancel = Button(input_frame, text="Отмена", state="disabled", command=cancel_job, padx=10)
+    btn_cancel.grid(row=2, column=1, sticky="e")
+    lbl_status = Label(input_frame, text="")
+    lbl_status.grid(row=3, column=0, sticky="w")
+
     # Очистка окна вывода
     output_text.delete(1.0, END)
 
 
-def check_button(machine):
+def check_button(dfa):
     text = txt.get()
     if text == 'quit':
         return 0
-    if all([c in machine.V for c in text]):
-        output_text.insert(END, "Цепочка состоит только из символов алфавита, начинаю проверку...\n")
-        check_word(text, machine, machine.Start)
-    else:
-        output_text.insert(END, "Ошибка. Слово состоит из символов, которых нет в алфавите.\n")
+    if text == "λ":
+        text = ""
+    start_job(check_word, text, dfa, trace_enabled.get(), progress_text="Выведено шагов: {done} из {total}")
 
 
-def check_word(word, machine, state):
-    if word == "λ":
-        output_text.insert(END, f"Конечное состояние: {state}\n")
-        if state in machine.End:
-            output_text.insert(END, "Цепочка принадлежит заданному ДКА.\n")
-        else:
-            output_text.insert(END, "Ошибка. Конечное состояние не принадлежит множеству конечных состояний ДКА.\n")
+def start_job(work, *args, progress_text):
+    global job
+    if job is not None and job.is_running():
+        messagebox.showinfo("Проверка", "Проверка уже выполняется.")
         return
+    job = BackgroundJob(window, output_text, work, *args, status=lbl_status, cancel_button=btn_cancel,
+                        progress_text=progress_text)
+    job.start()
+
 
-    output_text.insert(END, f"({state}, {word})\n")
-    if len(word) > 1:
-        try:
-            state = machine.Func[state][word[0]]
-        except KeyError:
-            output_text.insert(END, "Ошибка. Отсутствует переход для данного состояния.\n")
-            return
-        word = word[1:]
+def scan_progress(job):
+    # Прогресс по прочитанным байтам файла; отмена проверяется после каждого куска
+    def progress(done, total):
+        job.progress(done, total)
+        job.check()
+    return progress
+
+
+def cancel_job():
+    if job is not None:
+        job.cancel()
+
+
+def check_word(job, word, dfa, trace=True):
+    # Выполняется в фоновом потоке, вывод передаётся окну через job
+    if not set(word) <= dfa.symbol_ids.keys():
+        job.write("Ошибка. Слово состоит из символов, которых нет в алфавите.\n")
+        return
+    job.write("Цепочка состоит только из символов алфавита, начинаю проверку...\n")
+    result = dfa.run(word, trace)
+    if trace:
+        total = len(result.trace)
+        for step, (state, position) in enumerate(result.trace, 1):
+            rest = word[position:position + TRACE_WINDOW]
+            if position + TRACE_WINDOW < len(word):
+                rest += "..."
+            job.write(f"{position}: ({state}, {rest})\n")
+            job.progress(step, total)
+    if result.error == "transition":
+        job.write("Ошибка. Отсутствует переход для данного состояния.\n")
+        return
+    job.write(f"Конечное состояние: {result.state}\n")
+    if result.accepted:
+        job.write("Цепочка принадлежит заданному ДКА.\n")
     else:
-        try:
-            state = machine.Func[state][word[0]]
-        except KeyError:
-            output_text.insert(END, "Ошибка. Отсутствует переход для данного состояния.\n")
-            return
-        word = "λ"
-    check_word(word, machine, state)
+        job.write("Ошибка. Конечное состояние не принадлежит множеству конечных состояний ДКА.\n")
+
+
+def ask_input_file():
+    if current_dfa is None:
+        messagebox.showerror("Ошибка", "Сначала загрузите ДКА.")
+        return None
+    return filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")],
+                                      initialdir=path.dirname(__file__))
+
+
+def check_file():
+    file = ask_input_file()
+    if file:
+        start_job(check_words, current_dfa, file, progress_text="Проверено слов: {done} из {total}")
+
+
+def check_words(job, dfa, file):
+    # Выполняется в фоновом потоке
+    words = read_words(file)
+    accepted = 0
+    for begin in range(0, len(words), BATCH_SIZE):
+        batch = words[begin:begin + BATCH_SIZE]
+        flags, states = dfa.run_batch(batch)
+        accepted += int(sum(flags))
+        for word, ok, state in zip(batch[:max(BATCH_OUTPUT_LIMIT - begin, 0)], flags, states):
+            state = dfa.states[state] if state != dfa.dead else "-"
+            job.write(f"{word if word else 'λ'}: {'принадлежит' if ok else 'не принадлежит'} ({state})\n")
+        job.progress(begin + len(batch), len(words))
+        job.check()
+    if len(words) > BATCH_OUTPUT_LIMIT:
+        job.write(f"... показаны первые {BATCH_OUTPUT_LIMIT} слов\n")
+    job.write(f"Принято {accepted} из {len(words)} слов.\n")
+
+
+def check_whole_file():
+    file = ask_input_file()
+    if file:
+        start_job(check_file_content, current_dfa, file, progress_text="Прочитано байт: {done} из {total}")
+
+
+def check_file_content(job, dfa, file):
+    # Выполняется в фоновом потоке
+    if dfa.accepts_file(file, progress=scan_progress(job)):
+        job.write("Содержимое файла принадлежит заданному ДКА.\n")
+    else:
+        job.write("Содержимое файла не принадлежит заданному ДКА.\n")
+
+
+def search_file():
+    file = ask_input_file()
+    if file:
+        start_job(search_matches, current_dfa, file, progress_text="Прочитано байт: {done} из {total}")
+
+
+def search_matches(job, dfa, file):
+    # Выполняется в фоновом потоке
+    count = 0
+    for offset in dfa.iter_matches(file, progress=scan_progress(job)):
+        if count < BATCH_OUTPUT_LIMIT:
+            job.write(f"{offset}\n")
+        count += 1
+    if count > BATCH_OUTPUT_LIMIT:
+        job.write(f"... показаны первые {BATCH_OUTPUT_LIMIT} смещений\n")
+    job.write(f"Найдено {count} смещений конца подстрок, принимаемых ДКА.\n")
+
 
+current_dfa = None
+job = None  # Выполняющаяся в фоне проверка
+minimal_machines = {}  # хеш JSON-файла -> минимальный автомат
 
 if __name__ == '__main__':
     window = Tk()
@@ -131,6 +253,9 @@ if __name__ == '__main__':
     menubar = Menu(window)
     filemenu = Menu(menubar, tearoff=0)
     filemenu.add_command(label="Загрузить ДКА", command=load_machine)
+    filemenu.add_command(label="Проверить слова из файла", command=check_file)
+    filemenu.add_command(label="Проверить файл целиком", command=check_whole_file)
+    filemenu.add_command(label="Найти подстроки в файле", command=search_file)
     filemenu.add_separator()
     filemenu.add_command(label="Выход", command=window.quit)
     menubar.add_cascade(label="Файл", menu=filemenu)
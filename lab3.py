@@ -3,9 +3,14 @@ from typing import Dict, List
 from tkinter import *
 from tkinter import filedialog, messagebox, scrolledtext
 from os import path
-import json
 from functools import partial
 
+from automata import loader
+from automata.dpda import DPDATrace, format_rule, push_symbols
+from automata.npda import NPDA
+from tkjobs import BackgroundJob
+from traceview import TraceView
+
 
 @dataclass
 class Machine:
@@ -15,25 +20,26 @@ class Machine:
     Start_state: str
     Current_state: str
     Start_stack: str
-    Stack: str
+    Stack: List[str]  # Верхний символ - последний элемент списка
     End: str
 
 
 def machine_input(filename):
+    # Файл проверяет и компилирует automata.loader (EPS в правилах уже заменены на ε).
+    # Возвращает (Machine, загруженный автомат) или (None, None) при ошибке
     try:
-        with open(filename, "r") as json_file:
-            data = json.load(json_file)
-    except FileNotFoundError:
-        messagebox.showerror("Ошибка", "Файл с данными не найден.")
-        return None
-    states = data["states"]
-    alphabet = data["alphabet"]
-    in_stack = data["in_stack"]
-    rules = data["rules"]
-    start = data["start"]
-    stack = data["start_stack"]
-    end = data["end"]
-    return Machine(states, alphabet, rules, start, start, stack, stack, end)
+        loaded = loader.load_machine(filename)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Ошибка", f"Не удалось загрузить автомат: {e}")
+        return None, None
+    spec = loaded.spec
+    if spec.kind == "dfa":
+        messagebox.showerror("Ошибка", "В файле описан ДКА, а не МП-автомат.")
+        return None, None
+    stack = spec.start_stack
+    machine = Machine(spec.states, spec.alphabet, spec.rules, spec.start, spec.start, stack,
+                      list(push_symbols(stack)), spec.end)
+    return machine, loaded
 
 
 def generate_func_tab(machine, frame):
@@ -54,12 +60,17 @@ def load_machine():
                                       initialdir=path.dirname(__file__))
     if not file:
         return
-    machine = machine_input(file)
-    if machine:
-        display_machine(machine)
+    machine, loaded = machine_input(file)
+    if not machine:
+        return
+    if loaded.nondeterministic:
+        # Правила с выбором: цепочки проверяются перебором конфигураций
+        messagebox.showinfo("Недетерминированный автомат",
+                            f"{loaded.nondeterministic}\nПроверка пойдёт перебором конфигураций.")
+    display_machine(machine, loaded.compiled)
 
 
-def display_machine(machine):
+def display_machine(machine, dpda):
     # Очистка предыдущих данных
     for widget in func_frame.winfo_children():
         widget.destroy()
@@ -77,9 +88,16 @@ def display_machine(machine):
     txt = Entry(input_frame, width=60)
     txt.grid(row=1, column=0, sticky="ew")
 
-    btn_check_word = Button(input_frame, text="Проверить", command=partial(check_button, machine), padx=10, pady=10)
+    btn_check_word = Button(input_frame, text="Проверить", command=partial(check_button, machine, dpda), padx=10, pady=10)
     btn_check_word.grid(row=1, column=1, sticky="e")
 
+    # Проверка идёт в фоновом потоке, её можно прервать
+    global btn_cancel, lbl_status
+    btn_cancel = Button(input_frame, text="Отмена", state="disabled", command=cancel_job, padx=10, pady=10)
+    btn_cancel.grid(row=1, column=2, sticky="e")
+    lbl_status = Label(input_frame, text="")
+    lbl_status.grid(row=2, column=0, sticky="w")
+
     # Очистка окна вывода
     output_text.delete(1.0, END)
 
@@ -88,104 +106,88 @@ def display_machine(machine):
     canvas.configure(scrollregion=canvas.bbox("all"))
 
 
-def check_button(machine):
+def check_button(machine, dpda):
     text = txt.get()
     if text == 'quit':
         return 0
-    machine.Current_state = machine.Start_state
-    machine.Stack = machine.Start_stack
-    if all([c in machine.V for c in text]):
+    alphabet = set(machine.V)
+    if all(c in alphabet for c in text):
+        global job
+        if job is not None and job.is_running():
+            messagebox.showinfo("Проверка", "Проверка уже выполняется.")
+            return
         output_text.insert(END, "Цепочка состоит только из символов алфавита, начинаю проверку...\n")
         output_text.see(END)  # Автоматическая прокрутка вниз
-        check_word(text, machine)
+        # Проверка идёт в фоне; шаги ДМПА показываются в списке трассы
+        job = BackgroundJob(window, output_text, check_word, text, machine, dpda, on_done=show_trace,
+                            status=lbl_status, cancel_button=btn_cancel, progress_text="Выполнено шагов: {done}")
+        job.start()
     else:
         output_text.insert(END, "Ошибка. Слово состоит из символов, которых нет в алфавите.\n")
         output_text.see(END)  # Автоматическая прокрутка вниз
+        refresh_canvas()
 
-    # Обновление области прокрутки
-    canvas.update_idletasks()
-    canvas.configure(scrollregion=canvas.bbox("all"))
 
+def cancel_job():
+    if job is not None:
+        job.cancel()
 
-def check_word(word, machine):
-    output_text.insert(END, f"Начальное состояние стека: {machine.Stack}\n")
-    output_text.see(END)  # Автоматическая прокрутка вниз
-    step = 1
-    for i in word:
-        output_text.insert(END, f"Шаг {step}\n")
-        output_text.see(END)  # Автоматическая прокрутка вниз
-        rule_skip = 0
-        output_text.insert(END, f"Текущий символ: {i}\n")
-        output_text.see(END)  # Автоматическая прокрутка вниз
-        output_text.insert(END, f"Текущий стек: {machine.Stack}\n")
-        output_text.see(END)  # Автоматическая прокрутка вниз
-        for j in machine.Rules:
-            if machine.Current_state != j[0]:
-                rule_skip += 1
-                continue
-            if i != j[1]:
-                rule_skip += 1
-                continue
-            if machine.Stack[0] != j[2]:
-                rule_skip += 1
-                continue
-
-            output_text.insert(END, f"Применено правило: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]})\n\n")
-            output_text.see(END)  # Автоматическая прокрутка вниз
-            machine.Current_state = j[3]
-            if j[4] == "EPS":
-                machine.Stack = machine.Stack[1:]
-            elif len(j[4]) == 2:
-                machine.Stack = i + machine.Stack
-            elif j[4] == "ε":
-                machine.Stack = machine.Stack[1:]
-            break
-        step += 1
-        if rule_skip == len(machine.Rules):
-            output_text.insert(END, "Ошибка. Отсутствует переход для данного состояния.\n\n")
-            output_text.see(END)  # Автоматическая прокрутка вниз
-            return
 
-    while True:
-        if len(machine.Stack) == 0 and machine.Current_state == machine.End:
-            output_text.insert(END, "Цепочка принадлежит заданному ДМПА.\n\n")
-            output_text.see(END)  # Автоматическая прокрутка вниз
-            return
-        output_text.insert(END, f"Шаг {step}\n")
-        output_text.see(END)  # Автоматическая прокрутка вниз
-        rule_skip = 0
-        output_text.insert(END, f"Текущий символ: ε\n")
-        output_text.see(END)  # Автоматическая прокрутка вниз
-        output_text.insert(END, f"Текущий стек: {machine.Stack}\n")
-        output_text.see(END)  # Автоматическая прокрутка вниз
-        for j in machine.Rules:
-            if machine.Current_state != j[0]:
-                rule_skip += 1
-                continue
-            if "ε" != j[1] and "EPS" != j[1]:
-                rule_skip += 1
-                continue
-            if machine.Stack[0] != j[2]:
-                rule_skip += 1
-                continue
-
-            output_text.insert(END, f"Применено правило: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]})\n\n")
-            output_text.see(END)  # Автоматическая прокрутка вниз
-            machine.Current_state = j[3]
-            if j[4] == "ε" or j[4] == "EPS":
-                machine.Stack = machine.Stack[1:]
-                break
-        step += 1
-        if rule_skip == len(machine.Rules):
-            output_text.insert(END, "Ошибка. Отсутствует переход для данного состояния.\n\n")
-            output_text.see(END)  # Автоматическая прокрутка вниз
-            return
+def show_trace(trace):
+    if trace is not None:
+        trace_view.show(trace)
+    refresh_canvas()
+
 
+def refresh_canvas(*_):
     # Обновление области прокрутки
     canvas.update_idletasks()
     canvas.configure(scrollregion=canvas.bbox("all"))
 
 
+def check_word(job, word, machine, dpda):
+    # Выполняется в фоновом потоке, вывод передаётся окну через job
+    if isinstance(dpda, NPDA):
+        check_word_nondeterministic(job, word, machine, dpda)
+        return
+    # Автомат работает в automata.dpda. Шаги пишутся в компактную трассу (несколько
+    # чисел на шаг) и показываются списком, который отрисовывает только видимые строки.
+    # Между кусками цепочки выводится число шагов и проверяется отмена
+    trace = DPDATrace(dpda)
+
+    def progress(read, total):
+        job.progress(len(trace))
+        job.check()
+
+    result = dpda.run(word, trace=trace, progress=progress)
+    job.progress(len(trace))
+    job.write(f"Начальное состояние стека: {machine.Start_stack}\n")
+    job.write(f"Шагов: {len(result.trace)}, см. список шагов выше\n")
+    if result.accepted:
+        job.write(f"Наибольшая глубина стека: {result.max_depth}\n")
+        job.write("Цепочка принадлежит заданному ДМПА.\n\n")
+    else:
+        job.write("Ошибка. Отсутствует переход для данного состояния.\n\n")
+    return result.trace
+
+
+def check_word_nondeterministic(job, word, machine, npda):
+    # Выводятся правила найденного принимающего пути
+    result = npda.run(word, path=True)
+    job.write(f"Начальное состояние стека: {machine.Start_stack}\n")
+    job.write(f"Просмотрено ситуаций: {result.configurations}\n")
+    if result.accepted:
+        total = len(result.rules)
+        for step, rule in enumerate(result.rules, 1):
+            job.write(f"Шаг {step}. Применено правило: {format_rule(rule)}\n")
+            job.progress(step, total)
+        job.write("Цепочка принадлежит заданному МП-автомату.\n\n")
+    else:
+        job.write(f"Ни одна ветвь не принимает цепочку (прочитано не более {result.position} символов).\n\n")
+
+
+job = None  # Выполняющаяся в фоне проверка
+
 if __name__ == '__main__':
     window = Tk()
     window.title("Проверка цепочек на принадлежность ДМПА")
@@ -227,6 +229,10 @@ if __name__ == '__main__':
     input_frame = Frame(master=main_frame, padx=10, pady=15)
     input_frame.pack(fill="x")
 
+    # Список шагов последней проверки
+    trace_view = TraceView(main_frame, padx=10)
+    trace_view.pack(fill="both", expand=True)
+
     # Окно вывода
     output_text = scrolledtext.ScrolledText(main_frame, width=100, height=20, state="normal")
     output_text.pack(fill="both", expand=True, padx=10, pady=10)
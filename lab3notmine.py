@@ -5,12 +5,11 @@ from tkinter import filedialog
 from os import path
 from functools import partial
 from colorama import Fore, init
-import json
+
+from automata import loader
+from automata.dpda import format_rule, push_symbols
 
 nomachine = 0;
-window = Tk()
-txt = Entry(master=window, width=60)
-text = Text(master=window, width=60, height=10)
 
 
 @dataclass
@@ -21,36 +20,37 @@ class Machine:
     Start_state: str
     Current_state: str
     Start_stack: str
-    Stack: str
+    Stack: List[str]  # Верхний символ - последний элемент списка
     End: str
 
 
 def machine_input(filename):
+    # Файл проверяет и компилирует automata.loader (EPS в правилах уже заменены на ε).
+    # Возвращает (Machine, загруженный автомат) или (None, None) при ошибке
     try:
-        with open(filename, "r") as json_file:
-            data = json.load(json_file)
-    except FileNotFoundError:
-        print(Fore.RED + "Файл с данными не найден.")
-        exit(-1)
-    states = data["states"]
-    alphabet = data["alphabet"]
-    in_stack = data["in_stack"]
-    rules = data["rules"]
-    start = data["start"]
-    stack = data["start_stack"]
-    end = data["end"]
+        loaded = loader.load_machine(filename)
+    except (OSError, ValueError) as e:
+        print(Fore.RED + f"Не удалось загрузить ДМПА: {e}" + Fore.RESET)
+        return None, None
+    spec = loaded.spec
+    if spec.kind == "dfa":
+        print(Fore.RED + "В файле описан ДКА, а не МП-автомат." + Fore.RESET)
+        return None, None
+    states = spec.states
+    alphabet = spec.alphabet
+    in_stack = spec.stack_alphabet
+    rules = spec.rules
+    start = spec.start
+    stack = spec.start_stack
+    end = spec.end
     lbl_machine = Label(window, text=f"P({states}, {alphabet}, {in_stack}, δ, {start}, {stack}, {end})",
                         font=("Arial", 15), padx=5, pady=10)
     lbl_machine.grid(row=1, column=0, sticky="w")
     print(f"P({states}, {alphabet}, {in_stack}, δ, {start}, {stack}, {end})")
     for i in rules:
-        if i[1] == "EPS":
-            i[1] = "ε";
-        if i[4] == "EPS":
-            i[4] = "ε";
         print(f"({i[0]}, {i[1]}, {i[2]}) -> ({i[3]}, {i[4]})")
-    machine = Machine(states, alphabet, rules, start, start, stack, stack, end)
-    return machine
+    machine = Machine(states, alphabet, rules, start, start, stack, list(push_symbols(stack)), end)
+    return machine, loaded
 
 
 # Отрисовывает таблицу переходов
@@ -76,14 +76,20 @@ def clicked():
                                       initialdir=path.dirname(__file__))
     if not file:
         return
-    result = machine_input(file)
+    result, loaded = machine_input(file)
+    if result is None:
+        return
+    if loaded.nondeterministic:
+        print(Fore.RED + loaded.nondeterministic + Fore.RESET)
+        return
+    dpda = loaded.compiled
     frame = Frame(master=window, padx=10, pady=15)
     generate_func_tab(result, frame)
     frame.grid(row=2, column=0, sticky="w")
     lbl_check_word = Label(window, text=f" Введите цепочку для проверки: ", font=("Arial", 15), padx=5, pady=10)
     lbl_check_word.grid(row=3, column=0, sticky="w")
     txt.grid(row=4, column=0)
-    btn_check_word = Button(window, text="Проверить", command=partial(check_button, result), padx=10, pady=10)
+    btn_check_word = Button(window, text="Проверить", command=partial(check_button, result, dpda), padx=10, pady=10)
     btn_check_word.grid(row=4, column=1, sticky="e")
 
     text.grid(row=5, column=0, columnspan=2, sticky="w", padx=10)
@@ -92,96 +98,45 @@ def clicked():
     text.config(yscrollcommand=scroll.set)
 
 
-def check_button(machine):
+def check_button(machine, dpda):
     text = txt.get()
     if text == 'quit':
         return 0
-    machine.Current_state = machine.Start_state
-    machine.Stack = machine.Start_stack
-    if all([c in machine.V for c in text]):
+    alphabet = set(machine.V)
+    if all(c in alphabet for c in text):
         print(Fore.GREEN + "Цепочка состоит только из символов алфавита, начинаю проверку..." + Fore.RESET)
-        check_word(text, machine)
+        check_word(text, machine, dpda)
     else:
         print(Fore.RED + "\nОшибка. Слово состоит из символов, которых нет в алфавите.\n" + Fore.RESET)
 
 
-def check_word(word, machine):
-    # print("Stack:", machine.Stack, "\n")
-    text.insert(END, f"Stack: {machine.Stack}\n")
-    step = 1
-    for i in word:
+def check_word(word, machine, dpda):
+    # Автомат работает в automata.dpda, здесь только вывод его шагов
+    result = dpda.run(word, trace=True)
+    # print("Stack:", machine.Start_stack, "\n")
+    text.insert(END, f"Stack: {machine.Start_stack}\n")
+    for step, (state, symbol, stack, rule) in enumerate(result.trace, 1):
         # print(Fore.CYAN + "Step" + Fore.RESET, step)
         text.insert(END, f"Step {step}\n")
-        rule_skip = 0
-        # print("Chain:", i)
-        # print("Current stack:", machine.Stack)
-        text.insert(END, f"Chain {i}\n")
-        text.insert(END, f"Current stack: {machine.Stack}\n")
-        for j in machine.Rules:
-            # print(machine.Current_state, j[0])
-            if machine.Current_state != j[0]:
-                rule_skip += 1
-                continue
-            # print(i, j[1])
-            if i != j[1]:
-                rule_skip += 1
-                continue
-            # print(machine.Stack[0], j[2])
-            if machine.Stack[0] != j[2]:
-                rule_skip += 1
-                continue
-
-            # print(f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]})\n")
-            text.insert(END, f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]})\n\n")
-            machine.Current_state = j[3]
-            if len(j[4]) == 2:
-                machine.Stack = i + machine.Stack
-            elif j[4] == "ε":
-                machine.Stack = machine.Stack[1:]
-            break
-        step += 1
-        if rule_skip == len(machine.Rules):
-            # print(Fore.RED + "Ошибка. Отсутсвует переход для данного состояния.\n" + Fore.RESET)
-            text.insert(END, f"Ошибка. Отсутсвует переход для данного состояния.\n\n")
-            return
-    while TRUE:
-        if len(machine.Stack) == 0 and machine.Current_state == machine.End:
-            # print(Fore.GREEN + "Цепочка принадлежит заданному ДКА.\n" + Fore.RESET
-            text.insert(END, f"Цепочка принадлежит заданному ДКА.\n\n")
-            return
-        # print(Fore.CYAN + "Step" + Fore.RESET, step)
-        text.insert(END, f"Step {step}\n")
-        rule_skip = 0
-        # print("Chain: ε")
-        # print("Current stack:", machine.Stack)
-        text.insert(END, f"Chain: ε\n")
-        text.insert(END, f"Current stack: {machine.Stack}\n")
-        for j in machine.Rules:
-            if machine.Current_state != j[0]:
-                rule_skip += 1
-                continue
-            if "ε" != j[1]:
-                rule_skip += 1
-                continue
-            if machine.Stack[0] != j[2]:
-                rule_skip += 1
-                continue
-
-            # print(f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]})\n")
-            text.insert(END, f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]})\n\n")
-            machine.Current_state = j[3]
-            if j[4] == "ε":
-                machine.Stack = machine.Stack[1:]
-                break
-        step += 1
-        if rule_skip == len(machine.Rules):
-            # print(Fore.RED + "Ошибка. Отсутсвует переход для данного состояния.\n" + Fore.RESET)
-            text.insert(END, f"Ошибка. Отсутсвует переход для данного состояния.\n\n")
-            return
+        text.insert(END, f"Chain {symbol}\n")
+        text.insert(END, f"Current stack: {stack}\n")
+        if rule is not None:
+            text.insert(END, f"Rule: {format_rule(rule)}\n\n")
+    if result.accepted:
+        # print(Fore.GREEN + "Цепочка принадлежит заданному ДКА.\n" + Fore.RESET
+        text.insert(END, f"Max stack depth: {result.max_depth}\n")
+        text.insert(END, f"Цепочка принадлежит заданному ДКА.\n\n")
+    else:
+        # print(Fore.RED + "Ошибка. Отсутсвует переход для данного состояния.\n" + Fore.RESET)
+        text.insert(END, f"Ошибка. Отсутсвует переход для данного состояния.\n\n")
 
 
 # ζ δ ε
 if __name__ == '__main__':
+    # Окно создаётся только при запуске, чтобы модуль можно было импортировать без дисплея
+    window = Tk()
+    txt = Entry(master=window, width=60)
+    text = Text(master=window, width=60, height=10)
     ls = list()
     ls.append("Z")
     ls = ls[1:]
@@ -1,16 +1,18 @@
 from dataclasses import dataclass
 from typing import Dict, List
 from tkinter import *
-from tkinter import filedialog
+from tkinter import filedialog, messagebox
 from os import path
 from functools import partial
+import codecs
 from colorama import Fore, init
-import json
+
+from automata import loader
+from automata.dfa import CHUNK_SIZE
+from automata.dpda import format_rule
+from tkjobs import BackgroundJob
 
 nomachine = 0;
-window = Tk()
-txt = Entry(window, width=60)
-text = Text(master=window, width=60, height=10)
 
 
 @dataclass
@@ -27,34 +29,33 @@ class Machine:
 
 
 def machine_input(filename):
+    # Файл проверяет и компилирует automata.loader (EPS в правилах уже заменены на ε).
+    # Возвращает (Machine, загруженный автомат) или (None, None) при ошибке
     try:
-        with open(filename, "r") as json_file:
-            data = json.load(json_file)
-    except FileNotFoundError:
-        print(Fore.RED + "Файл с данными не найден.")
-        exit(-1)
-    states = data["states"]
-    alphabet = data["alphabet"]
-    in_stack = data["in_stack"]
-    in_transform = data["in_transform"]
-    rules = data["rules"]
-    start = data["start"]
-    stack = data["start_stack"]
-    end = data["end"]
+        loaded = loader.load_machine(filename)
+    except (OSError, ValueError) as e:
+        print(Fore.RED + f"Не удалось загрузить МП-преобразователь: {e}" + Fore.RESET)
+        return None, None
+    spec = loaded.spec
+    if spec.kind != "transducer":
+        print(Fore.RED + "В файле описан не МП-преобразователь: у правил нет выходной цепочки." + Fore.RESET)
+        return None, None
+    states = spec.states
+    alphabet = spec.alphabet
+    in_stack = spec.stack_alphabet
+    in_transform = spec.output_alphabet
+    rules = spec.rules
+    start = spec.start
+    stack = spec.start_stack
+    end = spec.end
     lbl_machine = Label(window, text=f"P({states}, {alphabet}, {in_stack}, {in_transform}, δ, {start}, {stack}, {end})",
                         font=("Arial", 15), padx=5, pady=10)
     lbl_machine.grid(row=1, column=0, sticky="w")
     print(f"P({states}, {alphabet}, {in_stack}, {in_transform}, δ, {start}, {stack}, {end})")
     for i in rules:
-        if i[1] == "EPS":
-            i[1] = "ε";
-        if i[4] == "EPS":
-            i[4] = "ε";
-        if i[5] == "EPS":
-            i[5] = "ε";
         print(f"({i[0]}, {i[1]}, {i[2]}) -> ({i[3]}, {i[4]}, {i[5]})")
     machine = Machine(states, alphabet, rules, start, start, stack, stack, "", end)
-    return machine
+    return machine, loaded
 
 
 # Отрисовывает таблицу переходов
@@ -80,121 +81,135 @@ def clicked():
                                       initialdir=path.dirname(__file__))
     if not file:
         return
-    result = machine_input(file)
+    result, loaded = machine_input(file)
+    if result is None:
+        return
+    if loaded.nondeterministic:
+        print(Fore.RED + loaded.nondeterministic + Fore.RESET)
+        return
+    transducer = loaded.compiled
     frame = Frame(master=window, padx=10, pady=15)
     generate_func_tab(result, frame)
     frame.grid(row=2, column=0, sticky="w")
     lbl_check_word = Label(window, text=f" Введите цепочку для проверки: ", font=("Arial", 15), padx=5, pady=10)
     lbl_check_word.grid(row=3, column=0, sticky="w")
     txt.grid(row=4, column=0)
-    btn_check_word = Button(window, text="Проверить", command=partial(check_button, result), padx=10, pady=10)
+    btn_check_word = Button(window, text="Проверить", command=partial(check_button, result, transducer), padx=10, pady=10)
     btn_check_word.grid(row=4, column=1, sticky="e")
+    btn_stream = Button(window, text="Перевести файл", command=partial(translate_file, transducer), padx=10, pady=10)
+    btn_stream.grid(row=4, column=2, sticky="e")
 
     text.grid(row=5, column=0, columnspan=2, sticky="w", padx=10)
     scroll = Scrollbar(command=text.yview)
     scroll.grid(row=5, column=1, sticky="n"+"s"+"w")
     text.config(yscrollcommand=scroll.set)
 
+    # Перевод файла идёт в фоновом потоке, его можно прервать
+    global btn_cancel, lbl_status
+    btn_cancel = Button(window, text="Отмена", state="disabled", command=cancel_job, padx=10)
+    btn_cancel.grid(row=6, column=0, sticky="w", padx=10)
+    lbl_status = Label(window, text="")
+    lbl_status.grid(row=6, column=1, sticky="w")
+
 
-def check_button(machine):
+def check_button(machine, transducer):
     chain = txt.get()
     if chain == 'quit':
         return 0
-    machine.Current_state = machine.Start_state
-    machine.Stack = machine.Start_stack
-    machine.Transform_stack = ""
-    if all([c in machine.V for c in chain]):
+    alphabet = set(machine.V)
+    if all(c in alphabet for c in chain):
         print(Fore.GREEN + "Цепочка состоит только из символов алфавита, начинаю проверку..." + Fore.RESET)
-        check_word(chain, machine)
+        check_word(chain, machine, transducer)
     else:
         print(Fore.RED + "\nОшибка. Слово состоит из символов, которых нет в алфавите.\n" + Fore.RESET)
 
 
-def check_word(chain, machine):
-    # print("Stack:", machine.Stack, "\n")
-    text.insert(END, f"Stack: {machine.Stack}\n")
-    step = 1
-    for i in chain:
+def check_word(chain, machine, transducer):
+    # Перевод выполняет automata.transducer, здесь только вывод его шагов
+    result = transducer.translate(chain, trace=True)
+    # print("Stack:", machine.Start_stack, "\n")
+    text.insert(END, f"Stack: {machine.Start_stack}\n")
+    transform = ""
+    for step, (state, symbol, stack, rule) in enumerate(result.trace, 1):
         # print(Fore.CYAN + "Step" + Fore.RESET, step)
         text.insert(END, f"Step {step}\n")
-        rule_skip = 0
-        # print("Chain:", i)
-        # print("Current stack:", machine.Stack)
-        text.insert(END, f"Chain {i}\n")
-        text.insert(END, f"Current stack: {machine.Stack}\n")
-        text.insert(END, f"Current transform: {machine.Transform_stack}\n")
-        for j in machine.Rules:
-            # print(machine.Current_state, j[0])
-            if machine.Current_state != j[0]:
-                rule_skip += 1
-                continue
-            # print(i, j[1])
-            if i != j[1]:
-                rule_skip += 1
-                continue
-            # print(machine.Stack[0], j[2])
-            if machine.Stack[0] != j[2]:
-                rule_skip += 1
-                continue
-
-            # print(f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]}, {j[5]})\n")
-            text.insert(END, f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]}, {j[5]})\n\n")
-            machine.Current_state = j[3]
-            if j[4] != "ε":
-                machine.Stack = j[4] + machine.Stack[1:]
-            elif j[4] == "ε":
-                machine.Stack = machine.Stack[1:]
-
-            if j[5] != "ε":
-                machine.Transform_stack = machine.Transform_stack + j[5]
-            break
-        step += 1
-        if rule_skip == len(machine.Rules):
-            # print(Fore.RED + "Ошибка. Отсутсвует переход для данного состояния.\n" + Fore.RESET)
-            text.insert(END, f"Ошибка. Отсутсвует переход для данного состояния.\n\n")
-            return
-    while TRUE:
-        if len(machine.Stack) == 0 and machine.Current_state in machine.End:
-            # print(Fore.GREEN + "Цепочка проходит заданный МП-преобразователь.\n" + Fore.RESET
-            text.insert(END, f"Цепочка проходит заданный МП-преобразователь.\n"
-                             f"Полученный перевод: {machine.Transform_stack}\n\n")
-            return
-        # print(Fore.CYAN + "Step" + Fore.RESET, step)
-        text.insert(END, f"Step {step}\n")
-        rule_skip = 0
-        # print("Chain: ε")
-        # print("Current stack:", machine.Stack)
-        text.insert(END, f"Chain: ε\n")
-        text.insert(END, f"Current stack: {machine.Stack}\n")
-        text.insert(END, f"Current transform: {machine.Transform_stack}\n")
-        for j in machine.Rules:
-            if machine.Current_state != j[0]:
-                rule_skip += 1
-                continue
-            if "ε" != j[1]:
-                rule_skip += 1
-                continue
-            if machine.Stack[0] != j[2]:
-                rule_skip += 1
-                continue
-
-            # print(f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]}, {j[5]})\n")
-            text.insert(END, f"Rule: ({j[0]}, {j[1]}, {j[2]}) -> ({j[3]}, {j[4]}, {j[5]})\n\n")
-            machine.Current_state = j[3]
-            if j[4] == "ε":
-                machine.Stack = machine.Stack[1:]
-            if j[5] != "ε":
-                machine.Transform_stack = machine.Transform_stack + j[5]
-            break
-        step += 1
-        if rule_skip == len(machine.Rules):
-            # print(Fore.RED + "Ошибка. Отсутсвует переход для данного состояния.\n" + Fore.RESET)
-            text.insert(END, f"Ошибка. Отсутсвует переход для данного состояния.\n\n")
-            return
+        text.insert(END, f"Chain {symbol}\n")
+        text.insert(END, f"Current stack: {stack}\n")
+        text.insert(END, f"Current transform: {transform}\n")
+        if rule is not None:
+            text.insert(END, f"Rule: {format_rule(rule)}\n\n")
+            if rule[5] != "ε":
+                transform += rule[5]
+    if result.accepted:
+        # print(Fore.GREEN + "Цепочка проходит заданный МП-преобразователь.\n" + Fore.RESET
+        text.insert(END, f"Цепочка проходит заданный МП-преобразователь.\n"
+                         f"Полученный перевод: {result.output}\n\n")
+    else:
+        # print(Fore.RED + "Ошибка. Отсутсвует переход для данного состояния.\n" + Fore.RESET)
+        text.insert(END, f"Ошибка. Отсутсвует переход для данного состояния.\n\n")
+
+
+def translate_file(transducer):
+    # Потоковый перевод: файл читается кусками, выход пишется в файл по мере появления,
+    # поэтому длина входа ограничена только диском. Вход - склеенные цепочки языка
+    # (например, журнал выражений); переводы строк пропускаются.
+    global job
+    if job is not None and job.is_running():
+        messagebox.showinfo("Перевод", "Перевод файла уже выполняется.")
+        return
+    source = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")],
+                                        initialdir=path.dirname(__file__))
+    if not source:
+        return
+    target = filedialog.asksaveasfilename(defaultextension=".txt", initialdir=path.dirname(source))
+    if not target:
+        return
+    job = BackgroundJob(window, text, translate_stream, transducer, source, target, status=lbl_status,
+                        cancel_button=btn_cancel, progress_text="Прочитано байт: {done} из {total}",
+                        error_title="Ошибка перевода").start()
+
+
+def translate_stream(job, transducer, source, target):
+    # Выполняется в фоновом потоке. Файл читается байтами, чтобы прогресс считался
+    # по его размеру; отмена проверяется после каждого куска
+    stream = transducer.stream(restart=True)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    done = 0
+    with open(source, "rb") as input_file, open(target, "w", encoding="utf-8") as output_file:
+        total = path.getsize(source)
+        for block in iter(partial(input_file.read, CHUNK_SIZE), b""):
+            chunk = decoder.decode(block)
+            output_file.write(stream.feed(chunk.replace("\n", "").replace("\r", "")))
+            if stream.error:
+                break
+            done += len(block)
+            job.progress(done, total)
+            job.check()
+        else:
+            output_file.write(stream.feed(decoder.decode(b"", final=True)))
+        output_file.write(stream.finish())
+    if stream.accepted:
+        job.write(f"Файл переведён: {stream.chains} цепочек, {stream.position} символов.\n"
+                  f"Перевод записан в {target}\n\n")
+    else:
+        reason = "символ не из алфавита" if stream.error == "symbol" else "отсутствует переход"
+        job.write(f"Ошибка после {stream.position} символов: {reason}. "
+                  f"Перевод до ошибки записан в {target}\n\n")
+
+
+def cancel_job():
+    if job is not None:
+        job.cancel()
+
 
+job = None  # Выполняющийся в фоне перевод файла
 
 # ζ δ ε
 if __name__ == '__main__':
+    # Окно создаётся только при запуске, чтобы модуль можно было импортировать без дисплея
+    window = Tk()
+    txt = Entry(window, width=60)
+    text = Text(master=window, width=60, height=10)
     ls = list()
     ls.append("Z")
     ls = ls[1:]
@@ -3,6 +3,16 @@ from tkinter import *
 from tkinter import filedialog, messagebox
 from os import path
 
+from automata.dpda import format_rule
+from automata.npda import NPDA
+from automata.transducer import Transducer
+from tkjobs import BackgroundJob
+
+# Сколько результатов пакетного перевода выводить в окно
+BATCH_OUTPUT_LIMIT = 1000
+# Сколько цепочек переводится за один вызов translate_many (между проверками отмены)
+BATCH_SIZE = 100_000
+
 class MPTransformer:
     def __init__(self, states, alphabet, stack_alphabet, rules, start_state, start_stack, end_states):
         self.states = states
@@ -12,6 +22,19 @@ class MPTransformer:
         self.start_state = start_state
         self.start_stack = start_stack
         self.end_states = end_states
+        # Детерминированный преобразователь работает по таблицам, собранным один раз.
+        # Если у правил есть выбор (например, ε-правило и правило со входом для одного
+        # верха стека), перевод ищется перебором конфигураций.
+        try:
+            transducer = Transducer(states, alphabet, self.rules, start_state, start_stack, end_states)
+        except ValueError:
+            transducer = None
+        if transducer is not None and transducer.strictly_deterministic:
+            self._transducer, self._npda = transducer, None
+        else:
+            self._transducer, self._npda = None, NPDA(states, alphabet, self.rules, start_state, start_stack,
+                                                      end_states)
+        self.steps = []
 
     def _normalize_rules(self, rules):
         # Заменяем "EPS" на "ε" в правилах
@@ -28,69 +51,44 @@ class MPTransformer:
             normalized_rules.append(normalized_rule)
         return normalized_rules
 
-    def translate(self, input_chain):
-        self.current_state = self.start_state
-        self.stack = [self.start_stack]
-        self.output = ""
-        self.steps = []
+    def translate(self, input_chain, record_steps=True):
+        # Шаги перевода (self.steps) записываются, только если record_steps
+        success, result = self._translate(input_chain, record_steps)
+        if success:
+            return True, f"Цепочка переведена успешно. Результат: {result}"
+        return False, result
 
+    def _translate(self, input_chain, record_steps):
+        # (True, перевод) или (False, сообщение об ошибке)
+        self.steps = []
+        alphabet = set(self.alphabet)
         for symbol in input_chain:
-            if symbol not in self.alphabet:
+            if symbol not in alphabet:
                 return False, f"Ошибка: символ '{symbol}' не принадлежит алфавиту."
 
-            if not self.stack:
-                return False, "Ошибка: стек пуст, дальнейшая обработка невозможна."
-
-            step_info = self._process_symbol(symbol)
-            if not step_info:
+        if self._transducer is not None:
+            result = self._transducer.translate(input_chain, trace=record_steps)
+            if not result.accepted:
                 return False, "Ошибка: отсутствует правило для данного символа и состояния."
-
-        # Обработка завершающих ε-переходов
-        while self.stack:
-            step_info = self._process_epsilon()
-            if not step_info:
-                return False, "Ошибка: невозможно завершить обработку (стек не пуст)."
-
-        if self.current_state in self.end_states:
-            return True, f"Цепочка переведена успешно. Результат: {self.output}"
-        else:
-            return False, "Ошибка: конечное состояние не достигнуто."
-
-    def _process_symbol(self, symbol):
-        if not self.stack:
-            return False
-
-        for rule in self.rules:
-            if (rule[0] == self.current_state and
-                rule[1] == symbol and
-                rule[2] == self.stack[-1]):
-                self.current_state = rule[3]
-                self.stack.pop()
-                if rule[4] != "ε":
-                    self.stack.extend(reversed(list(rule[4])))
-                if rule[5] != "ε":
-                    self.output += rule[5]
-                self.steps.append(f"({rule[0]}, {symbol}, {rule[2]}) -> ({rule[3]}, {rule[4]}, {rule[5]})")
-                return True
-        return False
-
-    def _process_epsilon(self):
-        if not self.stack:
-            return False
-
-        for rule in self.rules:
-            if (rule[0] == self.current_state and
-                rule[1] == "ε" and
-                rule[2] == self.stack[-1]):
-                self.current_state = rule[3]
-                self.stack.pop()
-                if rule[4] != "ε":
-                    self.stack.extend(reversed(list(rule[4])))
-                if rule[5] != "ε":
-                    self.output += rule[5]
-                self.steps.append(f"({rule[0]}, ε, {rule[2]}) -> ({rule[3]}, {rule[4]}, {rule[5]})")
-                return True
-        return False
+            if record_steps:
+                self.steps = [format_rule(rule) for *_, rule in result.trace]
+            return True, result.output
+
+        result = self._npda.run(input_chain, path=True)
+        if not result.accepted:
+            return False, "Ошибка: ни одна ветвь вычисления не принимает цепочку."
+        if record_steps:
+            self.steps = [format_rule(rule) for rule in result.rules]
+        return True, result.output
+
+    def translate_many(self, chains):
+        # Пакетный перевод без записи шагов: для каждой цепочки (успех, перевод или сообщение)
+        if self._transducer is None:
+            return [self._translate(chain, False) for chain in chains]
+        return [(True, result.output) if result.accepted else
+                (False, "Ошибка: символ не принадлежит алфавиту." if result.error == "symbol" else
+                 "Ошибка: отсутствует правило для данного символа и состояния.")
+                for result in self._transducer.translate_many(chains)]
 
 
 class MPTransformerApp:
@@ -100,6 +98,7 @@ class MPTransformerApp:
         self.root.geometry("600x400")
 
         self.machine = None
+        self.job = None  # Выполняющийся в фоне перевод
 
         # Меню
         self.menu_bar = Menu(root)
@@ -120,6 +119,14 @@ class MPTransformerApp:
         self.check_button = Button(root, text="Проверить цепочку", command=self.check_chain)
         self.check_button.pack(pady=10)
 
+        self.cancel_button = Button(root, text="Отмена", state="disabled", command=self.cancel_job)
+        self.cancel_button.pack(pady=5)
+        self.status_label = Label(root, text="")
+        self.status_label.pack()
+
+        self.file_button = Button(root, text="Перевести цепочки из файла", command=self.translate_file)
+        self.file_button.pack(pady=5)
+
         self.output_text = Text(root, width=70, height=15, wrap=WORD)
         self.output_text.pack(pady=10)
 
@@ -160,19 +167,69 @@ class MPTransformerApp:
             messagebox.showerror("Ошибка", "Введите цепочку для проверки.")
             return
 
-        self.output_text.insert(END, f"Проверка цепочки: {chain}\n")
+        if self.job is not None and self.job.is_running():
+            messagebox.showinfo("Перевод", "Перевод уже выполняется.")
+            return
 
-        success, message = self.machine.translate(chain)
+        self.output_text.insert(END, f"Проверка цепочки: {chain}\n")
+        # Перевод и вывод шагов идут в фоновом потоке, окно получает вывод пачками
+        self.job = BackgroundJob(self.root, self.output_text, self._check_chain, self.machine, chain,
+                                 status=self.status_label, cancel_button=self.cancel_button,
+                                 progress_text="Выведено шагов: {done} из {total}").start()
+
+    def _check_chain(self, job, machine, chain):
+        # Выполняется в фоновом потоке
+        success, message = machine.translate(chain)
         if success:
-            self.output_text.insert(END, f"Результат: {message}\n")
+            job.write(f"Результат: {message}\n")
         else:
-            self.output_text.insert(END, f"Ошибка: {message}\n")
+            job.write(f"Ошибка: {message}\n")
+
+        job.write("Шаги перевода:\n")
+        total = len(machine.steps)
+        for number, step in enumerate(machine.steps, 1):
+            job.write(f"{step}\n")
+            job.progress(number, total)
+        job.write("\n")
 
-        self.output_text.insert(END, "Шаги перевода:\n")
-        for step in self.machine.steps:
-            self.output_text.insert(END, f"{step}\n")
-        self.output_text.insert(END, "\n")
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
 
+    def translate_file(self):
+        # Цепочки по одной на строку переводятся пакетами в фоновом потоке
+        if not self.machine:
+            messagebox.showerror("Ошибка", "Сначала загрузите МП-преобразователь.")
+            return
+        if self.job is not None and self.job.is_running():
+            messagebox.showinfo("Перевод", "Перевод уже выполняется.")
+            return
+        file = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")],
+                                          initialdir=path.dirname(__file__))
+        if not file:
+            return
+        self.job = BackgroundJob(self.root, self.output_text, self._translate_file, self.machine, file,
+                                 status=self.status_label, cancel_button=self.cancel_button,
+                                 progress_text="Переведено цепочек: {done} из {total}").start()
+
+    def _translate_file(self, job, machine, file):
+        # Выполняется в фоновом потоке
+        with open(file, "r", encoding="utf-8") as f:
+            chains = [line.rstrip("\r\n") for line in f]
+        chains = [chain for chain in chains if chain]
+
+        translated = 0
+        for begin in range(0, len(chains), BATCH_SIZE):
+            batch = chains[begin:begin + BATCH_SIZE]
+            results = machine.translate_many(batch)
+            translated += sum(success for success, _ in results)
+            for chain, (success, message) in zip(batch[:max(BATCH_OUTPUT_LIMIT - begin, 0)], results):
+                job.write(f"{chain} -> {message}\n" if success else f"{chain}: {message}\n")
+            job.progress(begin + len(batch), len(chains))
+            job.check()
+        if len(chains) > BATCH_OUTPUT_LIMIT:
+            job.write(f"... показаны первые {BATCH_OUTPUT_LIMIT}\n")
+        job.write(f"Переведено {translated} из {len(chains)} цепочек.\n\n")
 
 if __name__ == "__main__":
     root = Tk()
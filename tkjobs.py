@@ -0,0 +1,158 @@
+import queue
+import threading
+from tkinter import END, messagebox
+
+FRAME_MS = 40  # Период перерисовки вывода (25 кадров в секунду)
+FRAME_CHARS = 100_000  # Сколько символов вывода вставлять в поле за один кадр
+WRITE_BATCH = 500  # Сколько строк фоновый поток копит перед передачей в окно
+MAX_QUEUED = 64  # Сколько пачек может ждать отрисовки, дальше фоновый поток ждёт окно
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BackgroundJob:
+    # Задание, выполняемое в фоновом потоке, с выводом в текстовое поле Tk.
+    # work(job, *args) вызывается в потоке: строки вывода передаются через job.write,
+    # прогресс - через job.progress(сделано, всего). Окно Tk трогает только главный поток:
+    # раз в кадр он забирает накопленный вывод и вставляет его одним insert,
+    # обновляет надпись с прогрессом и прокручивает поле один раз.
+    # Отмена проверяется при каждой передаче вывода (и в job.check), поэтому
+    # задание, которое пишет вывод, останавливается без дополнительных проверок.
+    # По окончании вызывается on_done(результат work); ошибка показывается окном.
+    def __init__(self, widget, output, work, *args, on_done=None, status=None, cancel_button=None,
+                 progress_text="Выполнено {done} из {total}", cancelled_text="Отменено", error_title="Ошибка"):
+        self.widget = widget
+        self.output = output
+        self.result = None
+        self.error = None
+        self._work = work
+        self._args = args
+        self._on_done = on_done
+        self._status = status
+        self._cancel_button = cancel_button
+        self._progress_text = progress_text
+        self._cancelled_text = cancelled_text
+        self._error_title = error_title
+        self._done = 0
+        self._total = None
+        self._shown = (0, None)  # Надпись обновляется после первого вызова progress
+        self._lines = []
+        self._chunks = queue.Queue(MAX_QUEUED)
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def start(self):
+        if self._cancel_button is not None:
+            self._cancel_button.config(state="normal")
+        self._thread.start()
+        self.widget.after(FRAME_MS, self._poll)
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    # Методы для фонового потока
+
+    def write(self, line):
+        self._lines.append(line)
+        if len(self._lines) >= WRITE_BATCH:
+            self._flush()
+
+    def progress(self, done, total=None):
+        # Окно читает последние значения раз в кадр, поэтому вызывать можно часто
+        self._done, self._total = done, total
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled
+
+    def _flush(self):
+        chunk = "".join(self._lines)
+        self._lines = []
+        while True:
+            self.check()
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _run(self):
+        try:
+            result = self._work(self, *self._args)
+            if self._lines:
+                self._flush()
+            self.result = result
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+
+    # Главный поток
+
+    def _poll(self):
+        parts = []
+        size = 0
+        while size < FRAME_CHARS:
+            try:
+                chunk = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        if parts and not self.cancelled:
+            # Поле только для чтения на время вставки открывается
+            state = self.output.cget("state")
+            self.output.config(state="normal")
+            self.output.insert(END, "".join(parts))
+            self.output.config(state=state)
+            self.output.see(END)
+        if self._status is not None and (self._done, self._total) != self._shown:
+            self._shown = (self._done, self._total)
+            total = "?" if self._total is None else self._total
+            self._status.config(text=self._progress_text.format(done=self._done, total=total))
+        if self._thread.is_alive() or not self._chunks.empty() and not self.cancelled:
+            self.widget.after(FRAME_MS, self._poll)
+            return
+        self._finish()
+
+    def _finish(self):
+        if self._cancel_button is not None:
+            self._cancel_button.config(state="disabled")
+        if self.cancelled:
+            if self._status is not None:
+                self._status.config(text=self._cancelled_text)
+        elif self.error is not None:
+            if self._status is not None:
+                self._status.config(text="")
+            messagebox.showerror(self._error_title, str(self.error))
+        elif self._on_done is not None:
+            self._on_done(self.result)
+
+
+class ListboxOutput:
+    # Вывод задания в список Tk вместо текстового поля: каждая строка вывода -
+    # отдельный элемент списка. Передаётся в BackgroundJob вместо output.
+    def __init__(self, listbox):
+        self.listbox = listbox
+
+    def cget(self, option):
+        return self.listbox.cget(option)
+
+    def config(self, **options):
+        self.listbox.config(**options)
+
+    def insert(self, index, text):
+        self.listbox.insert(index, *text.splitlines())
+
+    def see(self, index):
+        self.listbox.see(index)
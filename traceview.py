@@ -0,0 +1,129 @@
+from tkinter import *
+from tkinter import messagebox
+
+STACK_TEXT_LIMIT = 300  # Сколько символов стека показывать под списком
+
+
+class TraceView(Frame):
+    # Список шагов компактной трассы (automata.dpda.DPDATrace). В текстовом поле всегда
+    # лежат только видимые строки: прокрутка меняет номер первой строки и перерисовывает
+    # окно, поэтому стоимость показа не зависит от длины трассы. Полосу прокрутки
+    # двигает сам список по номеру первой строки.
+    # Щелчок по строке выбирает шаг и показывает стек перед ним.
+    def __init__(self, master, rows=15, width=100, **kwargs):
+        super().__init__(master, **kwargs)
+        self.trace = None
+        self.rows = rows
+        self.first = 0
+        self.selected = None
+
+        toolbar = Frame(self)
+        toolbar.pack(fill="x")
+        Label(toolbar, text="Шаг:").pack(side="left")
+        self.step_entry = Entry(toolbar, width=10)
+        self.step_entry.pack(side="left")
+        self.step_entry.bind("<Return>", lambda _: self.jump())
+        Button(toolbar, text="Перейти", command=self.jump).pack(side="left", padx=5)
+        Label(toolbar, text="Поиск:").pack(side="left", padx=(15, 0))
+        self.search_entry = Entry(toolbar, width=20)
+        self.search_entry.pack(side="left")
+        self.search_entry.bind("<Return>", lambda _: self.search())
+        Button(toolbar, text="Найти далее", command=self.search).pack(side="left", padx=5)
+        self.count_label = Label(toolbar, text="")
+        self.count_label.pack(side="right")
+
+        body = Frame(self)
+        body.pack(fill="both", expand=True)
+        self.text = Text(body, height=rows, width=width, wrap="none", state="disabled", cursor="arrow")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.tag_configure("selected", background="#cce0ff")
+        self.scrollbar = Scrollbar(body, command=self._scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.bind("<Button-1>", self._click)
+        self.text.bind("<MouseWheel>", lambda event: self.scroll_to(self.first - event.delta // 40))
+        self.text.bind("<Button-4>", lambda _: self.scroll_to(self.first - 3))
+        self.text.bind("<Button-5>", lambda _: self.scroll_to(self.first + 3))
+
+        self.stack_label = Label(self, text="", anchor="w", justify="left", wraplength=700)
+        self.stack_label.pack(fill="x")
+
+    def show(self, trace):
+        self.trace = trace
+        self.first = 0
+        self.selected = None
+        self.count_label.config(text=f"Всего шагов: {len(trace)}")
+        self.stack_label.config(text="")
+        self._render()
+
+    def scroll_to(self, first):
+        if self.trace is None:
+            return "break"
+        self.first = max(0, min(first, len(self.trace) - self.rows))
+        self._render()
+        return "break"
+
+    def select(self, step):
+        # Выбор шага: он оказывается в середине окна, под списком - стек перед ним
+        self.selected = step
+        stack = self.trace.stack(step)
+        if len(stack) > STACK_TEXT_LIMIT:
+            stack = stack[:STACK_TEXT_LIMIT] + "..."
+        self.stack_label.config(text=f"Стек перед шагом {step + 1}: {stack or 'пуст'}")
+        if not self.first <= step < self.first + self.rows:
+            self.first = step - self.rows // 2
+        self.scroll_to(self.first)
+
+    def jump(self):
+        if self.trace is None or not len(self.trace):
+            return
+        try:
+            step = int(self.step_entry.get()) - 1
+        except ValueError:
+            messagebox.showerror("Ошибка", "Номер шага должен быть числом.")
+            return
+        self.select(max(0, min(step, len(self.trace) - 1)))
+
+    def search(self):
+        text = self.search_entry.get()
+        if self.trace is None or not text:
+            return
+        start = self.first if self.selected is None else self.selected + 1
+        step = self.trace.find(text, start)
+        if step < 0:
+            messagebox.showinfo("Поиск", f"После шага {start} «{text}» не найдено.")
+            return
+        self.select(step)
+
+    def _scroll(self, *args):
+        # Команды полосы прокрутки: ("moveto", доля) или ("scroll", n, "units"/"pages")
+        if self.trace is None:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.trace)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.rows if args[2] == "pages" else 1)
+            self.scroll_to(self.first + step)
+
+    def _click(self, event):
+        if self.trace is None:
+            return "break"
+        step = self.first + int(self.text.index(f"@{event.x},{event.y}").split(".")[0]) - 1
+        if step < len(self.trace):
+            self.select(step)
+        return "break"
+
+    def _render(self):
+        total = len(self.trace)
+        last = min(self.first + self.rows, total)
+        lines = [self.trace.format_step(i) for i in range(self.first, last)]
+        self.text.config(state="normal")
+        self.text.delete("1.0", END)
+        self.text.insert("1.0", "\n".join(lines))
+        if self.selected is not None and self.first <= self.selected < last:
+            row = self.selected - self.first + 1
+            self.text.tag_add("selected", f"{row}.0", f"{row}.end")
+        self.text.config(state="disabled")
+        if total:
+            self.scrollbar.set(self.first / total, last / total)
+        else:
+            self.scrollbar.set(0, 1)